@@ -11,7 +11,7 @@ export async function GET(req: Request) {
 }
 export async function POST(req: Request) {
   const json = await req.json();
-  const { contractAddress, argsAddress } = json;
+  const { contractAddress, argsAddress, buildId } = json;
 
   // const anthropic = new Anthropic({
   //   apiKey: process.env.NEXT_CLAUDE_API_KEY,
@@ -27,6 +27,7 @@ export async function POST(req: Request) {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({
+      build_id: buildId,
       contract_address: contractAddress,
       constructor_address: argsAddress,
     }),
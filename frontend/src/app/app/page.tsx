@@ -198,6 +198,7 @@ export default function Home() {
       body: JSON.stringify({
         contractAddress: contractaddress,
         argsAddress: address,
+        buildId: generatedData.build_id,
       }),
     });
   }
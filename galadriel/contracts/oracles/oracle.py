@@ -5,6 +5,7 @@ import settings
 
 from src.repositories.ipfs_repository import IpfsRepository
 from src.repositories.web3.chat_repository import Web3ChatRepository
+from src.repositories.web3.event_listener import Web3EventListener
 from src.repositories.web3.function_repository import Web3FunctionRepository
 from src.repositories.web3.knowledge_base_repository import Web3KnowledgeBaseRepository
 from src.repositories.knowledge_base_repository import KnowledgeBaseRepository
@@ -21,6 +22,13 @@ kb_repository = KnowledgeBaseRepository(max_size=settings.KNOWLEDGE_BASE_CACHE_M
 
 repositories = [web3_chat_repository, web3_function_repository, web3_kb_repository]
 
+event_listener = None
+if settings.ORACLE_INGESTION_MODE == "events":
+    event_listener = Web3EventListener()
+    for repo in list(repositories):
+        repo.listen_to(event_listener)
+    repositories.append(event_listener)
+
 
 async def collect_and_save_metrics():
     while True:
@@ -56,6 +64,8 @@ async def main():
         ),
         collect_and_save_metrics(),
     ]
+    if event_listener:
+        tasks.append(event_listener.execute())
 
     print("Oracle started!")
     await asyncio.gather(*tasks)
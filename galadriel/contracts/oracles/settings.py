@@ -16,6 +16,16 @@ WEB3_RPC_URL = os.getenv("WEB3_RPC_URL", "https://devnet.galadriel.com")
 PRIVATE_KEY = os.getenv("PRIVATE_KEY")
 ORACLE_ADDRESS = os.getenv("ORACLE_ADDRESS")
 ORACLE_ABI_PATH = os.getenv("ORACLE_ABI_PATH", "abi/ChatOracle.json")
+# Maximum number of eth_calls sent in one JSON-RPC batch request
+WEB3_BATCH_SIZE = int(os.getenv("WEB3_BATCH_SIZE", 100))
+# Maximum number of items (or batches of prompts) fetched at the same time when indexing
+WEB3_FETCH_CONCURRENCY = int(os.getenv("WEB3_FETCH_CONCURRENCY", 10))
+# "events" to learn about new requests from the oracle's logs, "polling" to poll counts
+ORACLE_INGESTION_MODE = os.getenv("ORACLE_INGESTION_MODE", "polling")
+WEB3_LOGS_BLOCK_RANGE = int(os.getenv("WEB3_LOGS_BLOCK_RANGE", 1000))
+WEB3_LOGS_POLL_INTERVAL = float(os.getenv("WEB3_LOGS_POLL_INTERVAL", 1))
+# Seconds between two count polls in "events" mode, in case a log was missed
+WEB3_COUNT_RECONCILE_INTERVAL = float(os.getenv("WEB3_COUNT_RECONCILE_INTERVAL", 60))
 
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "galadriel-assets")
 SERVE_METRICS = os.getenv("SERVE_METRICS", "False").lower() == "true"
@@ -1,9 +1,22 @@
+import asyncio
 import json
+import time
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
 
 from web3 import AsyncWeb3
+from web3.contract.async_contract import AsyncContractFunction
+from web3.exceptions import BadFunctionCallOutput
+from web3.exceptions import ContractLogicError
 from web3.types import TxReceipt
 
 import settings
+from src.repositories.web3 import call_batch
 
 
 class Web3BaseRepository:
@@ -20,6 +33,46 @@ class Web3BaseRepository:
             "transactions_sent": 0,
             "errors": 0,
         }
+        self.event_listener = None
+        self.event_queues = {}
+        # Item count known from events and time of the last count poll, by event name
+        self.event_counts = {}
+        self.last_count_polls = {}
+
+    def listen_to(self, event_listener) -> None:
+        """
+        Learn about new items from a `Web3EventListener` instead of polling the counts.
+        """
+        self.event_listener = event_listener
+
+    async def _get_count(
+        self, event_name: str, count_function: Callable[[], Awaitable[int]]
+    ) -> int:
+        """
+        Number of items to index up to. Without a healthy event listener this calls
+        `count_function`, otherwise the IDs from the `event_name` events are used, with
+        a count poll on the first call and every WEB3_COUNT_RECONCILE_INTERVAL seconds
+        in case a log was missed.
+        """
+        if self.event_listener is None:
+            return await count_function()
+        if event_name not in self.event_queues:
+            self.event_queues[event_name] = self.event_listener.subscribe(event_name)
+        queue = self.event_queues[event_name]
+        count = self.event_counts.get(event_name, 0)
+        while not queue.empty():
+            count = max(count, queue.get_nowait() + 1)
+        now = time.monotonic()
+        if (
+            not self.event_listener.healthy
+            or event_name not in self.last_count_polls
+            or now - self.last_count_polls[event_name]
+            >= settings.WEB3_COUNT_RECONCILE_INTERVAL
+        ):
+            count = max(count, await count_function())
+            self.last_count_polls[event_name] = now
+        self.event_counts[event_name] = count
+        return count
 
     async def _find_first_unprocessed(self, count, is_processed_func, max_retries=3):
         low = 0
@@ -44,6 +97,90 @@ class Web3BaseRepository:
                         break
         return low
 
+    async def _fetch_in_order(
+        self,
+        ids: Iterable[int],
+        fetch: Callable[[int], Awaitable[Any]],
+        concurrency: Optional[int] = None,
+    ) -> List[Tuple[int, Any]]:
+        """
+        Fetch items with at most `concurrency` (WEB3_FETCH_CONCURRENCY by default)
+        fetches in flight.
+
+        Returns (id, result) pairs, in ID order, for the contiguous prefix of IDs whose
+        fetch completed. The first fetch that raises ends the prefix: later results are
+        dropped so that the caller's count does not move past it, and the item is
+        fetched again on the next poll.
+        """
+        ids = list(ids)
+        semaphore = asyncio.Semaphore(concurrency or settings.WEB3_FETCH_CONCURRENCY)
+        first_failure = len(ids)
+
+        async def fetch_one(index: int):
+            nonlocal first_failure
+            async with semaphore:
+                # Nothing after a failure can be kept
+                if index > first_failure:
+                    return None
+                try:
+                    return await fetch(ids[index])
+                except Exception as e:
+                    if index < first_failure:
+                        first_failure = index
+                    return e
+
+        results = await asyncio.gather(*[fetch_one(i) for i in range(len(ids))])
+        if first_failure < len(ids):
+            print(
+                f"Error fetching item {ids[first_failure]}: {results[first_failure]}, "
+                "retrying from it on the next poll",
+                flush=True,
+            )
+        return list(zip(ids[:first_failure], results[:first_failure]))
+
+    async def _batch_call(self, calls: List[AsyncContractFunction]) -> List[Any]:
+        """
+        Run view calls in JSON-RPC batch requests of up to WEB3_BATCH_SIZE eth_calls,
+        sent concurrently.
+
+        Returns the decoded output of each call, like `.call()`, in order. A call that
+        reverts or cannot be decoded gets its exception in its slot instead, so one bad
+        item does not fail the others; transport and node errors, such as rate limits,
+        are raised. A batch the node rejects is sent again as separate calls.
+        """
+        chunks = [
+            calls[start : start + settings.WEB3_BATCH_SIZE]
+            for start in range(0, len(calls), settings.WEB3_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(*[self._send_batch(chunk) for chunk in chunks])
+        return [result for chunk_results in results for result in chunk_results]
+
+    async def _send_batch(self, calls: List[AsyncContractFunction]) -> List[Any]:
+        payload = [call_batch.encode_call(i, call) for i, call in enumerate(calls)]
+        responses = await self._post_batch(payload)
+        if not isinstance(responses, list):
+            # The node does not support batch requests
+            results = await asyncio.gather(
+                *[call.call() for call in calls], return_exceptions=True
+            )
+        else:
+            by_id = {response.get("id"): response for response in responses}
+            results = [
+                call_batch.decode_call_response(
+                    self.web3_client.codec, call, by_id.get(i)
+                )
+                for i, call in enumerate(calls)
+            ]
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(
+                result, (ContractLogicError, BadFunctionCallOutput)
+            ):
+                raise result
+        return results
+
+    async def _post_batch(self, payload: List[dict]) -> Any:
+        return await call_batch.post_batch(self.web3_client.provider, payload)
+
     async def _sign_and_send_tx(self, tx) -> TxReceipt:
         try:
             signed_tx = self.web3_client.eth.account.sign_transaction(
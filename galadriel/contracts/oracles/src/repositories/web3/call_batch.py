@@ -0,0 +1,90 @@
+"""
+JSON-RPC batches of eth_calls.
+
+web3 6 has no public batch API, so this module is the only place relying on its
+internals: it posts a raw batch with the provider's HTTP session and encodes and decodes
+calls the way `AsyncContractFunction.call` does. web3 is pinned in requirements.txt.
+Raw batches skip the provider middlewares, none of which changes a plain eth_call.
+"""
+
+import json
+from typing import Any
+from typing import List
+from typing import Optional
+
+from aiohttp import ClientResponseError
+from eth_abi.exceptions import DecodingError
+from hexbytes import HexBytes
+from web3._utils.abi import get_abi_output_types
+from web3._utils.abi import map_abi_data
+from web3._utils.normalizers import BASE_RETURN_NORMALIZERS
+from web3._utils.request import async_make_post_request
+from web3.contract.async_contract import AsyncContractFunction
+from web3.exceptions import BadFunctionCallOutput
+from web3.exceptions import ContractLogicError
+from web3.providers.async_base import AsyncBaseProvider
+
+
+def encode_call(request_id: int, call: AsyncContractFunction) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "method": "eth_call",
+        "params": [
+            {"to": call.address, "data": call._encode_transaction_data()},
+            "latest",
+        ],
+    }
+
+
+async def post_batch(provider: AsyncBaseProvider, payload: List[dict]) -> Optional[Any]:
+    """
+    Post a batch to the provider's endpoint.
+
+    Returns the decoded JSON answer, or None if the node answers with an HTTP error or
+    something other than JSON, as nodes not accepting batches do. Connection errors are
+    raised.
+    """
+    try:
+        raw_response = await async_make_post_request(
+            provider.endpoint_uri,
+            json.dumps(payload),
+            **dict(provider.get_request_kwargs()),
+        )
+        return json.loads(raw_response)
+    except (ClientResponseError, ValueError) as e:
+        print(f"Batch of {len(payload)} eth_calls rejected: {e}", flush=True)
+        return None
+
+
+def _is_revert(error) -> bool:
+    return isinstance(error, dict) and (
+        error.get("code") == 3 or "execution reverted" in (error.get("message") or "")
+    )
+
+
+def decode_call_response(codec, call: AsyncContractFunction, response) -> Any:
+    """
+    Decode the answer to one eth_call of a batch, like `.call()` would. A missing,
+    reverted or undecodable answer is returned as the exception `.call()` would raise.
+    Only errors with code 3 or an "execution reverted" message are reverts, others
+    (rate limits, unknown blocks, timeouts) are node errors returned as a ValueError.
+    """
+    if not response:
+        return BadFunctionCallOutput(f"No response for {call.abi['name']}")
+    if "error" in response:
+        error = response["error"]
+        if _is_revert(error):
+            return ContractLogicError(
+                error.get("message") or "execution reverted", data=error.get("data")
+            )
+        return ValueError(error)
+    output_types = get_abi_output_types(call.abi)
+    try:
+        output_data = codec.decode(output_types, HexBytes(response.get("result")))
+    except (DecodingError, TypeError, ValueError) as e:
+        return BadFunctionCallOutput(f"Could not decode {call.abi['name']} output: {e}")
+    normalized_data = map_abi_data(BASE_RETURN_NORMALIZERS, output_types, output_data)
+    if len(normalized_data) == 1:
+        return normalized_data[0]
+    return normalized_data
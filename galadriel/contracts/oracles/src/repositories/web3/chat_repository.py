@@ -3,12 +3,14 @@ from typing import Any
 from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Union
 from typing import get_args
 
 from groq.types.chat import ChatCompletion as GroqChatCompletion
 from openai.types.chat import ChatCompletion
 from openai.types.chat import ChatCompletionToolParam
 from pydantic import TypeAdapter
+from web3.exceptions import ContractLogicError
 
 import settings
 from src.entities import ALLOWED_FUNCTION_NAMES
@@ -41,64 +43,157 @@ class Web3ChatRepository(Web3BaseRepository):
             }
         )
 
-    async def _get_chat(self, i: int) -> Optional[Chat]:
-        config = None
-        callback_id = await self.oracle_contract.functions.promptCallbackIds(i).call()
-
-        try:
-            prompt_type = await self._get_prompt_type(i)
-            is_prompt_processed = (
-                await self.oracle_contract.functions.isPromptProcessed(i).call()
-            )
-            if prompt_type == PromptType.OPENAI:
-                config = await self._get_openai_config(i)
-            elif prompt_type == PromptType.GROQ:
-                config = await self._get_groq_config(i)
+    async def _get_chats(self, ids: List[int]) -> List[Union[Chat, Exception, None]]:
+        """
+        Read a range of prompts in three rounds of batched calls: callback ID, type and
+        state, then configuration and history, then the legacy history getters for the
+        prompts whose `getMessagesAndRoles` call failed.
+
+        Returns one item per ID: the chat, None if a call for its configuration or
+        history reverts, or the exception if a call fails otherwise or its callback ID
+        cannot be read, in which case it must be read again later.
+        """
+        functions = self.oracle_contract.functions
+        heads = await self._batch_call(
+            [
+                call
+                for i in ids
+                for call in (
+                    functions.promptCallbackIds(i),
+                    functions.promptType(i),
+                    functions.isPromptProcessed(i),
+                )
+            ]
+        )
+        results = {}
+        chats = {}
+        for index, i in enumerate(ids):
+            callback_id, prompt_type, is_prompt_processed = heads[
+                3 * index : 3 * index + 3
+            ]
+            if isinstance(callback_id, Exception):
+                results[i] = callback_id
+                continue
+            for value in (prompt_type, is_prompt_processed):
+                if isinstance(value, Exception):
+                    results[i] = self._read_error(
+                        i, value, "configuration", "chats_configuration_errors"
+                    )
+                    break
             else:
-                config = await self._get_llm_config(i)
-        except Exception as e:
-            print(f"Error getting chat {i} configuration: {e}", flush=True)
-            self.metrics["chats_configuration_errors"] += 1
-            return None
-
-        messages = []
-        try:
-            # first try new method of reading history
-            history = await self.oracle_contract.functions.getMessagesAndRoles(
-                i, callback_id
-            ).call()
-            messages = await self._format_history(history)
-        except:
-            # fallback to old method
+                chats[i] = Chat(
+                    id=i,
+                    messages=[],
+                    callback_id=callback_id,
+                    is_processed=is_prompt_processed,
+                    prompt_type=_parse_prompt_type(prompt_type),
+                    config=None,
+                )
+
+        bodies = await self._batch_call(
+            [
+                call
+                for chat in chats.values()
+                for call in (
+                    self._get_config_call(chat),
+                    functions.getMessagesAndRoles(chat.id, chat.callback_id),
+                )
+            ]
+        )
+        legacy_history = []
+        for index, chat in enumerate(list(chats.values())):
+            config, history = bodies[2 * index : 2 * index + 2]
+            if isinstance(config, Exception):
+                del chats[chat.id]
+                results[chat.id] = self._read_error(
+                    chat.id, config, "configuration", "chats_configuration_errors"
+                )
+                continue
+            if isinstance(history, Exception) and not isinstance(
+                history, ContractLogicError
+            ):
+                del chats[chat.id]
+                results[chat.id] = history
+                continue
+            chat.config = _parse_config(chat.prompt_type, config)
             try:
-                contents = await self.oracle_contract.functions.getMessages(
-                    i, callback_id
-                ).call()
-                roles = await self.oracle_contract.functions.getRoles(
-                    i, callback_id
-                ).call()
-                for j in range(len(contents)):
-                    messages.append(
+                if isinstance(history, Exception):
+                    raise history
+                chat.messages = await self._format_history(history)
+            except:
+                # fallback to old method
+                legacy_history.append(chat)
+
+        if legacy_history:
+            contents_and_roles = await self._batch_call(
+                [
+                    call
+                    for chat in legacy_history
+                    for call in (
+                        functions.getMessages(chat.id, chat.callback_id),
+                        functions.getRoles(chat.id, chat.callback_id),
+                    )
+                ]
+            )
+            for index, chat in enumerate(legacy_history):
+                contents, roles = contents_and_roles[2 * index : 2 * index + 2]
+                error = next(
+                    (
+                        value
+                        for value in (contents, roles)
+                        if isinstance(value, Exception)
+                    ),
+                    None,
+                )
+                if error is not None:
+                    del chats[chat.id]
+                    results[chat.id] = self._read_error(
+                        chat.id, error, "history", "chats_history_read_errors"
+                    )
+                    continue
+                try:
+                    chat.messages = [
                         {
                             "role": roles[j],
                             "content": contents[j],
                         }
-                    )
-            except Exception as e:
-                print(f"Error getting chat {i} history: {e}", flush=True)
-                self.metrics["chats_history_read_errors"] += 1
-                return None
-        return Chat(
-            id=i,
-            messages=messages,
-            callback_id=callback_id,
-            is_processed=is_prompt_processed,
-            prompt_type=prompt_type,
-            config=config,
-        )
+                        for j in range(len(contents))
+                    ]
+                except IndexError as e:
+                    # More contents than roles
+                    print(f"Error getting chat {chat.id} history: {e}", flush=True)
+                    self.metrics["chats_history_read_errors"] += 1
+                    del chats[chat.id]
+                    results[chat.id] = None
+
+        results.update(chats)
+        return [results[i] for i in ids]
+
+    def _read_error(
+        self, i: int, error: Exception, what: str, metric: str
+    ) -> Optional[Exception]:
+        """
+        A reverted call makes prompt `i` unreadable for good: it is counted and skipped
+        (None). Other errors are returned, so the prompt is read again on the next poll.
+        """
+        if not isinstance(error, ContractLogicError):
+            return error
+        print(f"Error getting chat {i} {what}: {error}", flush=True)
+        self.metrics[metric] += 1
+        return None
+
+    def _get_config_call(self, chat: Chat):
+        if chat.prompt_type == PromptType.OPENAI:
+            return self.oracle_contract.functions.openAiConfigurations(chat.id)
+        elif chat.prompt_type == PromptType.GROQ:
+            return self.oracle_contract.functions.groqConfigurations(chat.id)
+        else:
+            return self.oracle_contract.functions.llmConfigurations(chat.id)
 
     async def _index_new_chats(self):
-        chats_count = await self.oracle_contract.functions.promptsCount().call()
+        chats_count = await self._get_count(
+            "PromptAdded", self.oracle_contract.functions.promptsCount().call
+        )
         self.metrics["chats_count"] = chats_count
         if not self.last_chats_count and chats_count > 0:
             self.last_chats_count = await self._find_first_unprocessed(
@@ -117,14 +212,30 @@ class Web3ChatRepository(Web3BaseRepository):
                 f"Indexing new prompts from {self.last_chats_count} to {chats_count}",
                 flush=True,
             )
-            for i in range(self.last_chats_count, chats_count):
-                chat = await self._get_chat(i)
-                if chat:
-                    self.indexed_chats.append(chat)
-                    self.metrics["chats_read"] += 1
-                    if chat.is_processed:
-                        self.metrics["chats_marked_as_done"] += 1
-                self.last_chats_count = i + 1
+            windows = await self._fetch_in_order(
+                range(self.last_chats_count, chats_count, settings.WEB3_BATCH_SIZE),
+                lambda start: self._get_chats(
+                    list(
+                        range(
+                            start, min(start + settings.WEB3_BATCH_SIZE, chats_count)
+                        )
+                    )
+                ),
+            )
+            for start, chats in windows:
+                for i, chat in enumerate(chats, start):
+                    if isinstance(chat, Exception):
+                        print(
+                            f"Error getting chat {i}: {chat}, retrying from it on the next poll",
+                            flush=True,
+                        )
+                        return
+                    if chat:
+                        self.indexed_chats.append(chat)
+                        self.metrics["chats_read"] += 1
+                        if chat.is_processed:
+                            self.metrics["chats_marked_as_done"] += 1
+                    self.last_chats_count = i + 1
 
     async def get_unanswered_chats(self) -> List[Chat]:
         await self._index_new_chats()
@@ -226,95 +337,6 @@ class Web3ChatRepository(Web3BaseRepository):
                 ).build_transaction(tx_data)
         return tx
 
-    async def _get_llm_config(self, i: int) -> Optional[LlmConfig]:
-        config = await self.oracle_contract.functions.llmConfigurations(i).call()
-        if not config or not config[0] or not config[0] in get_args(AnthropicModelType):
-            return None
-        try:
-            return LlmConfig(
-                model=config[0],
-                frequency_penalty=_parse_float_from_int(config[1], -20, 20),
-                logit_bias=_parse_json_string(config[2]),
-                # Check max value?
-                max_tokens=_value_or_none(config[3]),
-                presence_penalty=_parse_float_from_int(config[4], -20, 20),
-                response_format=_get_response_format(config[5]),
-                seed=_value_or_none(config[6]),
-                stop=_value_or_none(config[7]),
-                temperature=_parse_float_from_int(config[8], 0, 20),
-                top_p=_parse_float_from_int(config[9], 0, 100, decimals=2),
-                tools=_parse_tools(config[10]),
-                tool_choice=(
-                    config[11]
-                    if (config[11] and config[11] in get_args(ToolChoiceType))
-                    else None
-                ),
-                user=_value_or_none(config[12]),
-            )
-        except:
-            return None
-
-    async def _get_openai_config(self, i: int) -> Optional[OpenAiConfig]:
-        config = await self.oracle_contract.functions.openAiConfigurations(i).call()
-        if not config or not config[0] or not config[0] in get_args(OpenAiModelType):
-            return None
-        try:
-            return OpenAiConfig(
-                model=config[0],
-                frequency_penalty=_parse_float_from_int(config[1], -20, 20),
-                logit_bias=_parse_json_string(config[2]),
-                # Check max value?
-                max_tokens=_value_or_none(config[3]),
-                presence_penalty=_parse_float_from_int(config[4], -20, 20),
-                response_format=_get_response_format(config[5]),
-                seed=_value_or_none(config[6]),
-                stop=_value_or_none(config[7]),
-                temperature=_parse_float_from_int(config[8], 0, 20),
-                top_p=_parse_float_from_int(config[9], 0, 100, decimals=2),
-                tools=_parse_tools(config[10]),
-                tool_choice=(
-                    config[11]
-                    if (config[11] and config[11] in get_args(ToolChoiceType))
-                    else None
-                ),
-                user=_value_or_none(config[12]),
-            )
-        except:
-            return None
-
-    async def _get_groq_config(self, i: int) -> Optional[GroqConfig]:
-        config = await self.oracle_contract.functions.groqConfigurations(i).call()
-        if not config or not config[0] or not config[0] in get_args(GroqModelType):
-            return None
-        try:
-            return GroqConfig(
-                model=config[0],
-                frequency_penalty=_parse_float_from_int(config[1], -20, 20),
-                logit_bias=_parse_json_string(config[2]),
-                # Check max value?
-                max_tokens=_value_or_none(config[3]),
-                presence_penalty=_parse_float_from_int(config[4], -20, 20),
-                response_format=_get_response_format(config[5]),
-                seed=_value_or_none(config[6]),
-                stop=_value_or_none(config[7]),
-                temperature=_parse_float_from_int(config[8], 0, 20),
-                top_p=_parse_float_from_int(config[9], 0, 100, decimals=2),
-                user=_value_or_none(config[10]),
-            )
-        except:
-            return None
-
-    async def _get_prompt_type(self, i) -> PromptType:
-        prompt_type: Optional[str] = await self.oracle_contract.functions.promptType(
-            i
-        ).call()
-        if not prompt_type:
-            return PromptType.DEFAULT
-        try:
-            return PromptType(prompt_type)
-        except:
-            return PromptType.DEFAULT
-
     async def _format_history(self, history: List[str]) -> List[Dict]:
         formatted_history = []
         for entry in history:
@@ -344,6 +366,104 @@ class Web3ChatRepository(Web3BaseRepository):
         return formatted_history
 
 
+def _parse_llm_config(config) -> Optional[LlmConfig]:
+    if not config or not config[0] or not config[0] in get_args(AnthropicModelType):
+        return None
+    try:
+        return LlmConfig(
+            model=config[0],
+            frequency_penalty=_parse_float_from_int(config[1], -20, 20),
+            logit_bias=_parse_json_string(config[2]),
+            # Check max value?
+            max_tokens=_value_or_none(config[3]),
+            presence_penalty=_parse_float_from_int(config[4], -20, 20),
+            response_format=_get_response_format(config[5]),
+            seed=_value_or_none(config[6]),
+            stop=_value_or_none(config[7]),
+            temperature=_parse_float_from_int(config[8], 0, 20),
+            top_p=_parse_float_from_int(config[9], 0, 100, decimals=2),
+            tools=_parse_tools(config[10]),
+            tool_choice=(
+                config[11]
+                if (config[11] and config[11] in get_args(ToolChoiceType))
+                else None
+            ),
+            user=_value_or_none(config[12]),
+        )
+    except:
+        return None
+
+
+def _parse_openai_config(config) -> Optional[OpenAiConfig]:
+    if not config or not config[0] or not config[0] in get_args(OpenAiModelType):
+        return None
+    try:
+        return OpenAiConfig(
+            model=config[0],
+            frequency_penalty=_parse_float_from_int(config[1], -20, 20),
+            logit_bias=_parse_json_string(config[2]),
+            # Check max value?
+            max_tokens=_value_or_none(config[3]),
+            presence_penalty=_parse_float_from_int(config[4], -20, 20),
+            response_format=_get_response_format(config[5]),
+            seed=_value_or_none(config[6]),
+            stop=_value_or_none(config[7]),
+            temperature=_parse_float_from_int(config[8], 0, 20),
+            top_p=_parse_float_from_int(config[9], 0, 100, decimals=2),
+            tools=_parse_tools(config[10]),
+            tool_choice=(
+                config[11]
+                if (config[11] and config[11] in get_args(ToolChoiceType))
+                else None
+            ),
+            user=_value_or_none(config[12]),
+        )
+    except:
+        return None
+
+
+def _parse_groq_config(config) -> Optional[GroqConfig]:
+    if not config or not config[0] or not config[0] in get_args(GroqModelType):
+        return None
+    try:
+        return GroqConfig(
+            model=config[0],
+            frequency_penalty=_parse_float_from_int(config[1], -20, 20),
+            logit_bias=_parse_json_string(config[2]),
+            # Check max value?
+            max_tokens=_value_or_none(config[3]),
+            presence_penalty=_parse_float_from_int(config[4], -20, 20),
+            response_format=_get_response_format(config[5]),
+            seed=_value_or_none(config[6]),
+            stop=_value_or_none(config[7]),
+            temperature=_parse_float_from_int(config[8], 0, 20),
+            top_p=_parse_float_from_int(config[9], 0, 100, decimals=2),
+            user=_value_or_none(config[10]),
+        )
+    except:
+        return None
+
+
+def _parse_prompt_type(prompt_type: Optional[str]) -> PromptType:
+    if not prompt_type:
+        return PromptType.DEFAULT
+    try:
+        return PromptType(prompt_type)
+    except:
+        return PromptType.DEFAULT
+
+
+def _parse_config(
+    prompt_type: PromptType, config
+) -> Optional[Union[LlmConfig, OpenAiConfig, GroqConfig]]:
+    if prompt_type == PromptType.OPENAI:
+        return _parse_openai_config(config)
+    elif prompt_type == PromptType.GROQ:
+        return _parse_groq_config(config)
+    else:
+        return _parse_llm_config(config)
+
+
 def _value_or_none(value: Any) -> Optional[Any]:
     return value if value else None
 
@@ -0,0 +1,102 @@
+import asyncio
+from typing import Dict
+from typing import List
+
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+
+import settings
+from src.repositories.web3.base import Web3BaseRepository
+
+# Events announcing new work, with the name of the ID argument
+REQUEST_ADDED_EVENTS = {
+    "PromptAdded": "promptId",
+    "FunctionAdded": "functionId",
+    "KnowledgeBaseIndexRequestAdded": "id",
+    "KnowledgeBaseQueryAdded": "kbQueryId",
+}
+
+
+class Web3EventListener(Web3BaseRepository):
+    """
+    Reads the oracle's request-added events with eth_getLogs, page by page over block
+    ranges from the last processed block, and pushes the new IDs to the queues of the
+    subscribed repositories. `healthy` is False while logs cannot be read, so that the
+    repositories fall back to polling the counts.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.last_block = None
+        self.healthy = False
+        self.subscribers: Dict[str, List[asyncio.Queue]] = {
+            event_name: [] for event_name in REQUEST_ADDED_EVENTS
+        }
+        self.events_by_topic = {}
+        for event_name in REQUEST_ADDED_EVENTS:
+            event = self.oracle_contract.events[event_name]()
+            self.events_by_topic[event_abi_to_log_topic(event.abi)] = event
+        self.metrics.update(
+            {
+                "events_read": 0,
+                "events_read_errors": 0,
+                "events_decode_errors": 0,
+                "events_last_block": 0,
+            }
+        )
+
+    def subscribe(self, event_name: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self.subscribers[event_name].append(queue)
+        return queue
+
+    async def read_new_events(self):
+        latest_block = await self.web3_client.eth.block_number
+        if self.last_block is None:
+            # Earlier requests are found by the repositories' cold start
+            self.last_block = latest_block
+        while self.last_block < latest_block:
+            to_block = min(
+                latest_block, self.last_block + settings.WEB3_LOGS_BLOCK_RANGE
+            )
+            logs = await self.web3_client.eth.get_logs(
+                {
+                    "address": self.oracle_contract.address,
+                    "fromBlock": self.last_block + 1,
+                    "toBlock": to_block,
+                    "topics": [[Web3.to_hex(topic) for topic in self.events_by_topic]],
+                }
+            )
+            for log in logs:
+                try:
+                    event = self.events_by_topic[bytes(log["topics"][0])]
+                    event_data = event.process_log(log)
+                    event_name = event_data["event"]
+                    item_id = event_data["args"][REQUEST_ADDED_EVENTS[event_name]]
+                except Exception as e:
+                    # Retrying would not decode it either; the item is found by the
+                    # next count reconcile instead
+                    print(f"Skipping undecodable oracle log {log}: {e}", flush=True)
+                    self.metrics["events_decode_errors"] += 1
+                    continue
+                for queue in self.subscribers[event_name]:
+                    queue.put_nowait(item_id)
+                self.metrics["events_read"] += 1
+            # Per page, so a failing page does not read the previous ones again
+            self.last_block = to_block
+            self.metrics["events_last_block"] = to_block
+
+    async def execute(self):
+        while True:
+            try:
+                await self.read_new_events()
+                self.healthy = True
+            except Exception as e:
+                if self.healthy:
+                    print(
+                        f"Error reading oracle events: {e}, polling the counts",
+                        flush=True,
+                    )
+                self.healthy = False
+                self.metrics["events_read_errors"] += 1
+            await asyncio.sleep(settings.WEB3_LOGS_POLL_INTERVAL)
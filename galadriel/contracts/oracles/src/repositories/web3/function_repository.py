@@ -50,8 +50,8 @@ class Web3FunctionRepository(Web3BaseRepository):
             return None
 
     async def _index_new_function_calls(self):
-        function_calls_count = (
-            await self.oracle_contract.functions.functionsCount().call()
+        function_calls_count = await self._get_count(
+            "FunctionAdded", self.oracle_contract.functions.functionsCount().call
         )
         self.metrics["functions_count"] = function_calls_count
         if not self.last_function_calls_count and function_calls_count > 0:
@@ -71,8 +71,11 @@ class Web3FunctionRepository(Web3BaseRepository):
                 f"Indexing new function calls from {self.last_function_calls_count} to {function_calls_count}",
                 flush=True,
             )
-            for i in range(self.last_function_calls_count, function_calls_count):
-                function_call = await self._get_function_call(i)
+            function_calls = await self._fetch_in_order(
+                range(self.last_function_calls_count, function_calls_count),
+                self._get_function_call,
+            )
+            for i, function_call in function_calls:
                 if function_call:
                     self.indexed_function_calls.append(function_call)
                     self.metrics["functions_read"] += 1
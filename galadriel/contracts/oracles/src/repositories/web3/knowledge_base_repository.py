@@ -56,8 +56,9 @@ class Web3KnowledgeBaseRepository(Web3BaseRepository):
             return None
 
     async def _index_new_kb_index_requests(self):
-        kb_index_request_count = (
-            await self.oracle_contract.functions.kbIndexingRequestCount().call()
+        kb_index_request_count = await self._get_count(
+            "KnowledgeBaseIndexRequestAdded",
+            self.oracle_contract.functions.kbIndexingRequestCount().call,
         )
         self.metrics["knowledgebase_index_count"] = kb_index_request_count
         if not self.last_kb_index_request_count and kb_index_request_count > 0:
@@ -78,8 +79,11 @@ class Web3KnowledgeBaseRepository(Web3BaseRepository):
             print(
                 f"Indexing new knowledge base indexing requests from {self.last_kb_index_request_count} to {kb_index_request_count}"
             )
-            for i in range(self.last_kb_index_request_count, kb_index_request_count):
-                kb_index_request = await self._get_knowledge_base_indexing_request(i)
+            kb_index_requests = await self._fetch_in_order(
+                range(self.last_kb_index_request_count, kb_index_request_count),
+                self._get_knowledge_base_indexing_request,
+            )
+            for i, kb_index_request in kb_index_requests:
                 if kb_index_request:
                     self.indexed_kb_index_requests.append(kb_index_request)
                     self.metrics["knowledgebase_index_read"] += 1
@@ -183,7 +187,9 @@ class Web3KnowledgeBaseRepository(Web3BaseRepository):
             return None
 
     async def _index_new_kb_queries(self):
-        kb_query_count = await self.oracle_contract.functions.kbQueryCount().call()
+        kb_query_count = await self._get_count(
+            "KnowledgeBaseQueryAdded", self.oracle_contract.functions.kbQueryCount().call
+        )
         self.metrics["knowledgebase_query_count"] = kb_query_count
         if not self.last_kb_query_count and kb_query_count > 0:
             self.last_kb_query_count = await self._find_first_unprocessed(
@@ -203,8 +209,10 @@ class Web3KnowledgeBaseRepository(Web3BaseRepository):
             print(
                 f"Indexing new knowledge base queries from {self.last_kb_query_count} to {kb_query_count}"
             )
-            for i in range(self.last_kb_query_count, kb_query_count):
-                kb_query = await self._get_kb_query(i)
+            kb_queries = await self._fetch_in_order(
+                range(self.last_kb_query_count, kb_query_count), self._get_kb_query
+            )
+            for i, kb_query in kb_queries:
                 if kb_query:
                     self.indexed_kb_queries.append(kb_query)
                     self.metrics["knowledgebase_query_read"] += 1
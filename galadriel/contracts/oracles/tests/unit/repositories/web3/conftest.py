@@ -0,0 +1,137 @@
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from web3._utils.abi import get_abi_output_types
+
+import settings
+
+ORACLE_ADDRESS = "0x" + "22" * 20
+
+
+class FakeOracleNode:
+    """
+    Answers eth_calls to the oracle contract, batched or not, from `views`, a mapping of
+    function name to a callable taking the call arguments. A view raising an exception
+    answers with a JSON-RPC error, like a reverted call, except a `ConnectionError`
+    which fails the whole request, like an unreachable node. `errors` maps function names
+    to a JSON-RPC error object answered instead, for errors other than reverts, and calls
+    to the functions in `unanswered` are left out of batch answers.
+
+    `handle` serves the node over HTTP. With `reject_batches` set to "http" or "json",
+    batches are answered with an HTTP error or a JSON-RPC error object instead.
+    """
+
+    def __init__(self, contract):
+        self.contract = contract
+        self.views = {}
+        self.errors = {}
+        self.unanswered = set()
+        # Other JSON-RPC methods, name to a callable taking the params
+        self.rpc = {"eth_chainId": lambda: hex(int(settings.CHAIN_ID))}
+        self.batches = []
+        self.requests = []
+        self.reject_batches = None
+
+    async def post_batch(self, payload):
+        self.batches.append(payload)
+        return [
+            self._answer(request)
+            for request in payload
+            if self._function_name(request) not in self.unanswered
+        ]
+
+    async def make_request(self, method, params):
+        self.requests.append(method)
+        if method in self.rpc:
+            return {"jsonrpc": "2.0", "id": 0, "result": self.rpc[method](*params)}
+        return self._answer({"id": 0, "method": method, "params": params})
+
+    async def handle(self, request):
+        body = await request.json()
+        if not isinstance(body, list):
+            response = await self.make_request(body["method"], body["params"])
+            return web.json_response(dict(response, id=body["id"]))
+        if self.reject_batches == "http":
+            return web.Response(status=400, text="batch requests are not supported")
+        if self.reject_batches == "json":
+            return web.json_response(
+                {"jsonrpc": "2.0", "id": None, "error": {"code": -32600}}
+            )
+        return web.json_response(await self.post_batch(body))
+
+    def _function_name(self, request):
+        function, _ = self.contract.decode_function_input(request["params"][0]["data"])
+        return function.fn_name
+
+    def _answer(self, request):
+        function, arguments = self.contract.decode_function_input(
+            request["params"][0]["data"]
+        )
+        if function.fn_name in self.errors:
+            return {
+                "jsonrpc": "2.0",
+                "id": request["id"],
+                "error": self.errors[function.fn_name],
+            }
+        try:
+            value = self.views[function.fn_name](*arguments.values())
+        except ConnectionError:
+            raise
+        except Exception as e:
+            return {
+                "jsonrpc": "2.0",
+                "id": request["id"],
+                "error": {"code": 3, "message": str(e)},
+            }
+        output_types = get_abi_output_types(function.abi)
+        if len(output_types) == 1:
+            value = (value,)
+        result = self.contract.w3.codec.encode(output_types, value)
+        return {"jsonrpc": "2.0", "id": request["id"], "result": "0x" + result.hex()}
+
+
+@pytest.fixture
+def oracle_settings(monkeypatch):
+    monkeypatch.setattr(settings, "PRIVATE_KEY", "0x" + "11" * 32)
+    monkeypatch.setattr(settings, "ORACLE_ADDRESS", ORACLE_ADDRESS)
+    monkeypatch.setattr(settings, "WEB3_BATCH_SIZE", 100)
+
+
+@pytest.fixture
+def fake_node():
+    def attach(repository):
+        node = FakeOracleNode(repository.oracle_contract)
+        repository._post_batch = node.post_batch
+        repository.web3_client.provider.make_request = node.make_request
+        return node
+
+    return attach
+
+
+@pytest_asyncio.fixture
+async def http_node(monkeypatch):
+    """
+    Serve a `FakeOracleNode` on a local port and point WEB3_RPC_URL at it. Attach it to
+    a repository created afterwards, which then talks to it through its real provider.
+    """
+    node = None
+
+    async def handle(request):
+        return await node.handle(request)
+
+    app = web.Application()
+    app.router.add_post("/", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setattr(settings, "WEB3_RPC_URL", f"http://127.0.0.1:{port}")
+
+    def attach(repository):
+        nonlocal node
+        node = FakeOracleNode(repository.oracle_contract)
+        return node
+
+    yield attach
+    await runner.cleanup()
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from src.repositories.web3.base import Web3BaseRepository
+
+
+@pytest.fixture
+def repository(oracle_settings):
+    return Web3BaseRepository()
+
+
+@pytest.mark.asyncio
+async def test_fetch_in_order_keeps_id_order_and_bounds_concurrency(repository):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fetch(i):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        # Later IDs finish first
+        await asyncio.sleep(0.001 * (20 - i))
+        in_flight -= 1
+        return i * 10
+
+    results = await repository._fetch_in_order(range(20), fetch, concurrency=4)
+
+    assert results == [(i, i * 10) for i in range(20)]
+    assert max_in_flight == 4
+
+
+@pytest.mark.asyncio
+async def test_fetch_in_order_stops_at_first_failure(repository):
+    fetched = []
+
+    async def fetch(i):
+        fetched.append(i)
+        if i in (3, 6):
+            raise ValueError(f"cannot read {i}")
+        return i
+
+    results = await repository._fetch_in_order(range(10), fetch, concurrency=2)
+
+    assert results == [(0, 0), (1, 1), (2, 2)]
+    # Items queued behind the failure are not fetched
+    assert max(fetched) < 9
@@ -0,0 +1,89 @@
+import pytest
+from aiohttp import ClientError
+from web3.exceptions import ContractLogicError
+
+import settings
+from src.repositories.web3.base import Web3BaseRepository
+
+
+def _reverts(*args):
+    raise ValueError("execution reverted")
+
+
+@pytest.fixture
+def repository(oracle_settings, http_node):
+    repository = Web3BaseRepository()
+    node = http_node(repository)
+    node.views.update(
+        {
+            "promptCallbackIds": lambda i: _reverts() if i == 2 else 1000 + i,
+            "promptType": lambda i: "Groq",
+        }
+    )
+    return repository, node
+
+
+def _calls(repository):
+    functions = repository.oracle_contract.functions
+    return [functions.promptCallbackIds(i) for i in range(4)] + [
+        functions.promptType(0)
+    ]
+
+
+def _check(results):
+    assert results[:2] == [1000, 1001]
+    assert isinstance(results[2], ContractLogicError)
+    assert results[3:] == [1003, "Groq"]
+
+
+@pytest.mark.asyncio
+async def test_batch_call_posts_one_batch(repository):
+    repository, node = repository
+
+    results = await repository._batch_call(_calls(repository))
+
+    _check(results)
+    assert len(node.batches) == 1
+    assert node.requests == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("rejection", ["http", "json"])
+async def test_batch_call_falls_back_to_single_calls(repository, rejection):
+    repository, node = repository
+    node.reject_batches = rejection
+
+    results = await repository._batch_call(_calls(repository))
+
+    _check(results)
+    assert node.batches == []
+    assert node.requests.count("eth_call") == 5
+
+
+@pytest.mark.asyncio
+async def test_batch_call_raises_when_node_is_unreachable(oracle_settings, monkeypatch):
+    # Nothing listens on the discard port
+    monkeypatch.setattr(settings, "WEB3_RPC_URL", "http://127.0.0.1:9")
+    repository = Web3BaseRepository()
+    functions = repository.oracle_contract.functions
+
+    with pytest.raises(ClientError):
+        await repository._batch_call([functions.promptCallbackIds(0)])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("rejection", [None, "http"])
+@pytest.mark.parametrize(
+    "error",
+    [
+        {"code": -32005, "message": "limit exceeded"},
+        {"code": -32000, "message": "header not found"},
+    ],
+)
+async def test_batch_call_raises_node_errors(repository, rejection, error):
+    repository, node = repository
+    node.reject_batches = rejection
+    node.errors["promptType"] = error
+
+    with pytest.raises(ValueError, match=error["message"]):
+        await repository._batch_call(_calls(repository))
@@ -0,0 +1,139 @@
+import pytest
+
+from src.entities import PromptType
+from src.repositories.web3.chat_repository import Web3ChatRepository
+
+LLM_CONFIG = ("claude-3-5-sonnet-20240620", 0, "", 100, 0, "", 0, "", 10, 0, "", "", "")
+
+
+def _reverts(*args):
+    raise ValueError("execution reverted")
+
+
+@pytest.fixture
+def repository(oracle_settings, fake_node):
+    repository = Web3ChatRepository()
+    node = fake_node(repository)
+    node.views.update(
+        {
+            "promptsCount": lambda: 500,
+            "promptCallbackIds": lambda i: 1000 + i,
+            "promptType": lambda i: "Groq" if i % 2 else "",
+            "isPromptProcessed": lambda i: i < 3,
+            "llmConfigurations": lambda i: LLM_CONFIG,
+            "groqConfigurations": lambda i: ("", 0, "", 0, 0, "", 0, "", 0, 0, ""),
+            "getMessagesAndRoles": lambda i, callback_id: [
+                ("user", [("text", f"prompt {i} {callback_id}")])
+            ],
+        }
+    )
+    return repository, node
+
+
+@pytest.mark.asyncio
+async def test_get_chats_reads_prompts_in_batches(repository):
+    repository, node = repository
+
+    chats = await repository._get_chats([0, 1, 2, 3])
+
+    assert [chat.id for chat in chats] == [0, 1, 2, 3]
+    assert [chat.callback_id for chat in chats] == [1000, 1001, 1002, 1003]
+    assert [chat.is_processed for chat in chats] == [True, True, True, False]
+    assert chats[0].prompt_type == PromptType.DEFAULT
+    assert chats[1].prompt_type == PromptType.GROQ
+    assert chats[0].config.model == "claude-3-5-sonnet-20240620"
+    assert chats[1].config is None
+    assert chats[3].messages == [
+        {"role": "user", "content": [{"type": "text", "text": "prompt 3 1003"}]}
+    ]
+    assert len(node.batches) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_chats_falls_back_to_legacy_history(repository):
+    repository, node = repository
+    node.views["getMessagesAndRoles"] = _reverts
+    node.views["getMessages"] = lambda i, callback_id: ["hello", "hi"]
+    node.views["getRoles"] = lambda i, callback_id: ["user", "assistant"]
+
+    chats = await repository._get_chats([0, 1])
+
+    assert chats[0].messages == [
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi"},
+    ]
+    assert len(node.batches) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_chats_isolates_unreadable_prompts(repository):
+    repository, node = repository
+    node.views["isPromptProcessed"] = lambda i: _reverts() if i == 1 else False
+    node.views["getMessagesAndRoles"] = lambda i, callback_id: (
+        _reverts() if i == 2 else [("user", [("text", "hello")])]
+    )
+    node.views["getMessages"] = _reverts
+    node.views["promptCallbackIds"] = lambda i: _reverts() if i == 3 else i
+
+    chats = await repository._get_chats([0, 1, 2, 3])
+
+    assert chats[0].messages == [
+        {"role": "user", "content": [{"type": "text", "text": "hello"}]}
+    ]
+    assert chats[1] is None
+    assert chats[2] is None
+    assert isinstance(chats[3], Exception)
+    assert repository.metrics["chats_configuration_errors"] == 1
+    assert repository.metrics["chats_history_read_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_index_new_chats_takes_a_handful_of_round_trips(repository):
+    repository, node = repository
+    repository.last_chats_count = 3
+
+    await repository._index_new_chats()
+
+    assert repository.last_chats_count == 500
+    assert len(repository.indexed_chats) == 497
+    assert repository.metrics["chats_read"] == 497
+    # 5 windows of up to 100 prompts, each read with 3 calls per prompt (3 batches of
+    # 100 calls) then 2 (2 batches); only promptsCount is a plain call
+    assert len(node.batches) == 25
+    assert node.requests.count("eth_call") == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failure", ["error", "unanswered"])
+@pytest.mark.parametrize(
+    "function",
+    ["isPromptProcessed", "llmConfigurations", "getMessagesAndRoles", "getMessages"],
+)
+async def test_index_new_chats_retries_prompts_the_node_fails_to_read(
+    repository, function, failure
+):
+    repository, node = repository
+    repository.last_chats_count = 4
+    node.views["promptsCount"] = lambda: 14
+    if function == "getMessages":
+        node.views["getMessagesAndRoles"] = _reverts
+        node.views["getMessages"] = lambda i, callback_id: ["hello"]
+        node.views["getRoles"] = lambda i, callback_id: ["user"]
+    if failure == "error":
+        node.errors[function] = {"code": -32005, "message": "limit exceeded"}
+    else:
+        node.unanswered.add(function)
+
+    await repository._index_new_chats()
+
+    assert repository.last_chats_count == 4
+    assert repository.indexed_chats == []
+    assert repository.metrics["chats_configuration_errors"] == 0
+    assert repository.metrics["chats_history_read_errors"] == 0
+
+    node.errors.clear()
+    node.unanswered.clear()
+    await repository._index_new_chats()
+
+    assert repository.last_chats_count == 14
+    assert len(repository.indexed_chats) == 10
@@ -0,0 +1,161 @@
+import pytest
+from eth_abi import encode
+from eth_utils import event_abi_to_log_topic
+from web3 import Web3
+
+import settings
+from src.repositories.web3.event_listener import Web3EventListener
+from src.repositories.web3.function_repository import Web3FunctionRepository
+
+SENDER = "0x" + "33" * 20
+
+
+def _log(contract, event_name, item_id, block_number):
+    event_abi = contract.events[event_name]().abi
+    topics = [event_abi_to_log_topic(event_abi), encode(["uint256"], [item_id])]
+    data = encode(["address"], [SENDER])
+    if event_name == "PromptAdded":
+        topics.append(encode(["uint256"], [item_id + 1000]))
+    elif event_name == "FunctionAdded":
+        topics.append(Web3.keccak(text="query"))
+        data = encode(["uint256", "address"], [item_id + 1000, SENDER])
+    return {
+        "address": contract.address,
+        "topics": [Web3.to_hex(topic) for topic in topics],
+        "data": Web3.to_hex(data),
+        "blockNumber": hex(block_number),
+        "blockHash": "0x" + "44" * 32,
+        "transactionHash": "0x" + "55" * 32,
+        "transactionIndex": "0x0",
+        "logIndex": "0x0",
+        "removed": False,
+    }
+
+
+@pytest.fixture
+def listener(oracle_settings, fake_node, monkeypatch):
+    monkeypatch.setattr(settings, "WEB3_LOGS_BLOCK_RANGE", 10)
+    listener = Web3EventListener()
+    node = fake_node(listener)
+    node.block_number = 100
+    node.logs = []
+    node.get_logs_ranges = []
+
+    def get_logs(log_filter):
+        from_block = int(log_filter["fromBlock"], 16)
+        to_block = int(log_filter["toBlock"], 16)
+        node.get_logs_ranges.append((from_block, to_block))
+        return [
+            log
+            for log in node.logs
+            if from_block <= int(log["blockNumber"], 16) <= to_block
+        ]
+
+    node.rpc["eth_blockNumber"] = lambda: hex(node.block_number)
+    node.rpc["eth_getLogs"] = get_logs
+    return listener, node
+
+
+@pytest.mark.asyncio
+async def test_read_new_events_pages_through_block_ranges(listener):
+    listener, node = listener
+    prompts = listener.subscribe("PromptAdded")
+    kb_queries = listener.subscribe("KnowledgeBaseQueryAdded")
+
+    await listener.read_new_events()
+    assert node.get_logs_ranges == []
+
+    node.logs = [
+        _log(listener.oracle_contract, "PromptAdded", 7, 103),
+        _log(listener.oracle_contract, "KnowledgeBaseQueryAdded", 2, 115),
+        _log(listener.oracle_contract, "PromptAdded", 8, 124),
+    ]
+    node.block_number = 125
+    await listener.read_new_events()
+
+    assert node.get_logs_ranges == [(101, 110), (111, 120), (121, 125)]
+    assert [prompts.get_nowait(), prompts.get_nowait()] == [7, 8]
+    assert kb_queries.get_nowait() == 2
+    assert listener.last_block == 125
+    assert listener.metrics["events_read"] == 3
+
+
+@pytest.mark.asyncio
+async def test_read_new_events_skips_undecodable_logs(listener):
+    listener, node = listener
+    prompts = listener.subscribe("PromptAdded")
+    await listener.read_new_events()
+
+    truncated = _log(listener.oracle_contract, "PromptAdded", 7, 103)
+    truncated["data"] = "0x1234"
+    node.logs = [truncated, _log(listener.oracle_contract, "PromptAdded", 8, 104)]
+    node.block_number = 105
+    await listener.read_new_events()
+
+    assert prompts.get_nowait() == 8
+    assert prompts.empty()
+    assert listener.last_block == 105
+    assert listener.metrics["events_decode_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_read_new_events_keeps_the_pages_read_before_a_failure(listener):
+    listener, node = listener
+    await listener.read_new_events()
+
+    get_logs = node.rpc["eth_getLogs"]
+
+    def fails_after_first_page(log_filter):
+        if int(log_filter["fromBlock"], 16) > 101:
+            raise ConnectionError("node unreachable")
+        return get_logs(log_filter)
+
+    node.rpc["eth_getLogs"] = fails_after_first_page
+    node.block_number = 125
+    with pytest.raises(ConnectionError):
+        await listener.read_new_events()
+
+    assert listener.last_block == 110
+
+
+@pytest.mark.asyncio
+async def test_repository_indexes_from_events_and_falls_back_to_counts(
+    listener, fake_node
+):
+    listener, listener_node = listener
+    repository = Web3FunctionRepository()
+    node = fake_node(repository)
+    node.views.update(
+        {
+            "functionsCount": lambda: 2,
+            "functionCallbackIds": lambda i: i,
+            "isFunctionProcessed": lambda i: False,
+            "functionTypes": lambda i: "web_search",
+            "functionInputs": lambda i: "query",
+        }
+    )
+    repository.listen_to(listener)
+    await listener.read_new_events()
+    listener.healthy = True
+
+    # The first call polls the count
+    await repository._index_new_function_calls()
+    assert repository.last_function_calls_count == 2
+
+    # Then new work comes from the logs, without polling the count
+    node.views["functionsCount"] = lambda: pytest.fail("count polled")
+    listener_node.logs = [
+        _log(listener.oracle_contract, "FunctionAdded", 2, 101),
+        _log(listener.oracle_contract, "FunctionAdded", 3, 101),
+    ]
+    listener_node.block_number = 101
+    await listener.read_new_events()
+    await repository._index_new_function_calls()
+    assert [call.id for call in repository.indexed_function_calls] == [0, 1, 2, 3]
+    assert repository.last_function_calls_count == 4
+
+    # Without readable logs, the count is polled again
+    listener.healthy = False
+    node.views["functionsCount"] = lambda: 5
+    await repository._index_new_function_calls()
+    assert repository.last_function_calls_count == 5
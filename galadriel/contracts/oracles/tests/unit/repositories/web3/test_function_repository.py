@@ -0,0 +1,53 @@
+import pytest
+
+from src.repositories.web3.function_repository import Web3FunctionRepository
+
+
+def _raise(error):
+    raise error
+
+
+@pytest.fixture
+def repository(oracle_settings, fake_node):
+    repository = Web3FunctionRepository()
+    node = fake_node(repository)
+    node.views.update(
+        {
+            "functionsCount": lambda: 8,
+            "functionCallbackIds": lambda i: 100 + i,
+            "isFunctionProcessed": lambda i: False,
+            "functionTypes": lambda i: "web_search",
+            "functionInputs": lambda i: f"query {i}",
+        }
+    )
+    return repository, node
+
+
+@pytest.mark.asyncio
+async def test_index_new_function_calls(repository):
+    repository, node = repository
+    repository.last_function_calls_count = 2
+
+    await repository._index_new_function_calls()
+
+    assert [call.id for call in repository.indexed_function_calls] == list(range(2, 8))
+    assert repository.indexed_function_calls[0].function_input == "query 2"
+    assert repository.last_function_calls_count == 8
+
+
+@pytest.mark.asyncio
+async def test_index_new_function_calls_does_not_skip_failed_reads(repository):
+    repository, node = repository
+    repository.last_function_calls_count = 2
+    node.views["functionInputs"] = lambda i: (
+        _raise(ValueError("execution reverted")) if i == 3 else "query"
+    )
+    node.views["functionCallbackIds"] = lambda i: (
+        _raise(ConnectionError()) if i == 5 else 100 + i
+    )
+
+    await repository._index_new_function_calls()
+
+    # 3 reverts and is skipped, 5 cannot be read and is read again on the next poll
+    assert [call.id for call in repository.indexed_function_calls] == [2, 4]
+    assert repository.last_function_calls_count == 5
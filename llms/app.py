@@ -1,38 +1,128 @@
 import json
+import math
+import multiprocessing
 import os
+import queue
 import random
 import subprocess
+import threading
 import time
+from contextlib import nullcontext
 
 from dotenv import load_dotenv, find_dotenv
-from IPython.display import display, Markdown
-from openai import OpenAI
-import tiktoken
-from flask import Flask, request, jsonify
-from anthropic import Anthropic
+from flask import Flask, Response, request, jsonify, stream_with_context
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from functions import *
 from hook_address_miner import *
+from salt_index import SaltIndex
+from mining_jobs import MiningJobs
+from example_corpus import ExampleCorpus
+import async_llm
+from build_workspaces import BuildWorkspaces
+from compile_cache import CompileCache, compiler_settings
+from artifact_store import ArtifactStore
+from verification_jobs import ForgeVerifier, VerificationJobs
+from fix_conversation import FixConversation
+from auto_fixes import apply_auto_fixes
+from hook_source import prepare_source
 
 load_dotenv(find_dotenv())
 
-OpenAI_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-Anthropic_client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"),
-)
-
 file_path = 'instructions.txt'
 instructions = read_file(file_path)
 
 folder_path = '../foundry_hook_playground/src/examples'
-file_to_code = read_all_files_in_folder(folder_path)
 
-with open("hook_examples.json", 'r') as file:
-    hook_examples_json = json.load(file)
+salt_index = SaltIndex("salt_index")
+mining_jobs = MiningJobs(index=salt_index)
+build_workspaces = BuildWorkspaces("../foundry_hook_playground", cache=CompileCache("compile_cache"))
+# Tokens of fix conversation history sent per attempt, on top of the cached system prompt
+FIX_CONTEXT_TOKEN_BUDGET = int(os.environ.get("FIX_CONTEXT_TOKEN_BUDGET", 12000))
+# Candidates generated and compiled in parallel per request, 1 runs the fix rounds sequentially
+SPECULATIVE_CANDIDATES = int(os.environ.get("SPECULATIVE_CANDIDATES", 1))
+# Provider and temperature of each speculative candidate, None is the provider's default
+CANDIDATE_SETTINGS = [("claude", None), ("openai", None), ("claude", 1.0), ("openai", 1.0)]
+# Rebuilds with deterministic patches before a failed attempt goes back to the LLM
+MAX_AUTO_FIX_ROUNDS = 3
+# Passed to hook constructors taking only addresses when a request gives no constructor arguments,
+# instead of the deployer address
+POOL_MANAGER_ADDRESS = os.environ.get("POOL_MANAGER_ADDRESS")
+# Builds looked up by /verify, persisted in ARTIFACT_STORE_DIR if set
+artifact_store = ArtifactStore(max_builds=int(os.environ.get("ARTIFACT_STORE_MAX_BUILDS", 256)),
+                               directory=os.environ.get("ARTIFACT_STORE_DIR"))
+# Background verifications; VERIFIER_URL can point to a local stand-in of the Blockscout API
+verification_jobs = VerificationJobs(ForgeVerifier(build_workspaces, os.environ.get("VERIFIER_URL", "https://eth-sepolia.blockscout.com/api")),
+                                     max_concurrent=int(os.environ.get("MAX_CONCURRENT_VERIFICATIONS", 2)))
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+RAG_TOP_K = 5
+# Rerank the embedding candidates with the LLM ranker
+RAG_RERANK = os.environ.get("RAG_RERANK", "False").lower() == "true"
+
+
+# Example contracts and summaries, reindexed when they change on disk
+example_corpus = ExampleCorpus(folder_path, "hook_examples.json", lambda texts: get_embeddings(texts, EMBEDDING_MODEL),
+                               "example_embeddings.npz", EMBEDDING_MODEL, get_n_tokens)
+# Seconds between two checks of the examples for changes, 0 disables reloading
+EXAMPLES_RELOAD_INTERVAL = float(os.environ.get("EXAMPLES_RELOAD_INTERVAL", 5))
+
+
+def load_examples():
+    """
+    Index the examples once and start watching them for changes. Called by `warm_up`, and
+    by the first request if it comes before the warm-up is done.
+    """
+    if example_corpus.loaded:
+        return
+    try:
+        example_corpus.refresh()
+    finally:
+        # Also retries a failed first refresh
+        if EXAMPLES_RELOAD_INTERVAL > 0:
+            example_corpus.watch(EXAMPLES_RELOAD_INTERVAL)
+
 
-rag_instructions = f"""
+def warm_up():
+    """
+    Do the start-up work that would otherwise land on the first request: load the tokenizer,
+    the examples and the LLM clients, and warm the compiler cache. Prints the time of each step.
+    """
+    steps = [
+        ("tokenizer", get_encoding),
+        ("examples", load_examples),
+        ("LLM clients", async_llm.warm_up),
+        ("compiler", build_workspaces.base.warm_up),
+    ]
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"\u26A0\uFE0F Warm-up of {name} failed: {e}")
+            continue
+        print(f"\u23F1\uFE0F Warm-up of {name}: {time.perf_counter() - started:.2f}s")
+
+# Whether importing the app starts the warm-up, as gunicorn and `flask run` do
+WARM_UP_ON_START = os.environ.get("WARM_UP_ON_START", "True").lower() == "true"
+warm_up_thread = None
+warm_up_lock = threading.Lock()
+
+def start_warm_up():
+    """
+    Run `warm_up` in a background thread, once per process.
+    """
+    global warm_up_thread
+    with warm_up_lock:
+        if warm_up_thread is None:
+            warm_up_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            warm_up_thread.start()
+
+def get_rag_instructions(summaries):
+    return f"""
     You have a JSON object mapping file names to summaries:
 
-    {hook_examples_json}
+    {summaries}
 
     You will receive a user prompt and your task is to determine which Solidity files are most relevant to the prompt.
 
@@ -55,11 +145,49 @@ rag_instructions = f"""
 
 
 app = Flask(__name__)
+# Number of trusted reverse proxies in front of the app. Only then is X-Forwarded-For
+# used for the client address, which clients could otherwise set to anything
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", 0))
+if TRUSTED_PROXIES > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Admission control for hook generation, see `admission_control`
+INVOKE_RATE_PER_MINUTE = float(os.environ.get("INVOKE_RATE_PER_MINUTE", 6))
+INVOKE_BURST = int(os.environ.get("INVOKE_BURST", 2))
+MAX_CONCURRENT_GENERATIONS = int(os.environ.get("MAX_CONCURRENT_GENERATIONS", 4))
+MAX_QUEUED_GENERATIONS = int(os.environ.get("MAX_QUEUED_GENERATIONS", 16))
+GENERATION_QUEUE_TIMEOUT = float(os.environ.get("GENERATION_QUEUE_TIMEOUT", 30))
+
+def client_key(*args, **kwargs):
+    # The client address, not anything the client sends, so a bucket cannot be swapped for a fresh one
+    return request.remote_addr or ''
+
+invoke_admission = admission_control(client_key, INVOKE_RATE_PER_MINUTE / 60, INVOKE_BURST,
+                                     MAX_CONCURRENT_GENERATIONS, MAX_QUEUED_GENERATIONS,
+                                     GENERATION_QUEUE_TIMEOUT)
+
+@app.errorhandler(RateLimited)
+def rate_limited(error):
+    response = jsonify(error=str(error))
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
+async def rag_async(prompt):
+    query = (await async_llm.embed([prompt], EMBEDDING_MODEL))[0]
+    candidates = example_corpus.rank(query, RAG_TOP_K * 2 if RAG_RERANK else RAG_TOP_K)
+    print(f"\U0001F50E Embedding scores: { {file: round(score, 3) for file, _, score in candidates} }")
+    if not RAG_RERANK:
+        return {file: confidence for file, confidence, _ in candidates}
+
+    summaries = {file: example_corpus.get(file)['summary'] for file, _, _ in candidates}
+    rag_answer, _ = await async_llm.claude_answer(get_rag_instructions(summaries), [], prompt)
+    # rag_answer, _ = await async_llm.openai_answer(get_rag_instructions(summaries), [], prompt, json_output=True)
+    # The JSON object may come wrapped in a code fence
+    return json.loads(rag_answer[rag_answer.find('{'):rag_answer.rfind('}') + 1])
 
 def rag(prompt):
-    rag_answer, _ = get_claude_answer(rag_instructions, [], prompt)
-    # rag_answer, _ = get_openai_answer(rag_instructions, [], prompt, json_output=True)
-    return rag_answer
+    return async_llm.run(rag_async(prompt))
 
 @app.route('/hello', methods=['GET'])
 def hello():
@@ -68,103 +196,404 @@ def hello():
 def default():
     return "hi"
 
-@app.route('/invoke', methods=['POST'])
-@rate_limit(10)
-def invoke():
-    data = request.get_json()
-    prompt = data.get('prompt')
-    deployer_address = data.get('deployer_address')
-    print(f"----\n\u26A1\u26A1 Incoming Hook Prompt \u26A1\u26A1: {prompt}\n")
-    rag_answer = rag(prompt)
-#     rag_answer = """{
-#     "PointsHook.sol": "high",
-#     "ERC721OwnershipHook.sol": "medium",
-#     "CounterHook.sol": "medium",
-#     "WhiteListHook.sol": "low",
-#     "KYCHook.sol": "low"
-# }"""
-    print(f"\U0001F50E RAG Top 5 Example Hooks: {rag_answer}\n")
-
-    final_instructions = instructions
-
+def build_system_prompt(rag_files):
+    """
+    Assemble the hook generation system prompt as cacheable blocks: the instructions, then
+    the example contracts sorted by file name, then the output format. The instructions are
+    a prefix shared by every request, and the examples one shared by the fix attempts of a
+    request and by any request retrieving the same examples.
+    """
+    examples = ""
     counter = 1
-    for file in eval(rag_answer).keys():
-        if file not in list(hook_examples_json.keys()):
+    for file in sorted(rag_files.keys()):
+        example = example_corpus.get(file)
+        if example is None or example['summary'] is None:
             print(f"File {file} does not exist!")
         else:
-            final_instructions += f"""----------\nHOOK EXAMPLE {counter}:\n\n
-            SUMMARY: {hook_examples_json[file]}\n
-            CODE:\n {file_to_code[file]}\n\n\n------------------\n\n\n"""
+            examples += f"""----------\nHOOK EXAMPLE {counter}:\n\n
+            SUMMARY: {example['summary']}\n
+            CODE:\n {example['code']}\n\n\n------------------\n\n\n"""
             counter+=1
 
-    final_instructions+="OUTPUT: ONLY Solidity code, nothing else - no explanations, summaries or descriptions. ONLY working Solidity code, WITH comments."
+    blocks = [async_llm.cached_block(instructions)]
+    if examples:
+        blocks.append(async_llm.cached_block(examples))
+    blocks.append({"type": "text", "text": "OUTPUT: ONLY Solidity code, nothing else - no explanations, summaries or descriptions. ONLY working Solidity code, WITH comments."})
+    return blocks
+
+def auto_fix(answer, build, workspace, file_name, candidate, attempt):
+    """
+    Patch mechanical compile errors with the rules in `auto_fixes` and rebuild, for up to
+    `MAX_AUTO_FIX_ROUNDS` rounds, stopping when the contract compiles or no rule applies.
+
+    Yields an `autofix` event per rebuild and returns the last (source, build, file name).
+    """
+    for _ in range(MAX_AUTO_FIX_ROUNDS):
+        patched, rules = apply_auto_fixes(answer, build["diagnostics"], example_corpus.import_map)
+        if not rules:
+            break
+        file_name = generated_file_name(patched)
+        save_to_sol(patched, workspace.generated_dir, file_name)
+        build = workspace.compiler.compile(file_name)
+        answer = patched
+        print(f"\U0001F527 Auto-fix ({', '.join(rules)}): returncode {build['returncode']}")
+        yield "autofix", {"candidate": candidate, "attempt": attempt, "rules": rules, "returncode": build["returncode"],
+                          "stderr": build["stderr"], "diagnostics": build["diagnostics"], "elapsed": build["elapsed"],
+                          "cached": build["cached"]}
+        if build["returncode"] == 0:
+            break
+    return answer, build, file_name
+
+def generate_candidate(prompt, final_instructions, workspace, usage, candidate=0, provider="claude", temperature=None, should_stop=None):
+    """
+    Generate/compile-fix rounds for one candidate hook, built in `workspace`.
 
+    Failed builds first go through `auto_fix`, and only go back to the LLM if it cannot fix them.
+    Yields `token`, `compile` and `autofix` events tagged with the candidate, and returns
+    (answer, build, file name) of the last attempt, which compiled unless `build["returncode"]`
+    is non-zero, or None if `should_stop` turned true first.
+    """
+    stream_answer = stream_openai_answer if provider == "openai" else stream_claude_answer
     attempt_counter = 0
-    conversation_history = []
+    conversation = FixConversation(prompt, FIX_CONTEXT_TOKEN_BUDGET)
     returncode =- 1
 
     while (attempt_counter<5) and (returncode!=0):
-        file_name = f"generated_hook_{attempt_counter}.sol"
-        answer, conversation_history = get_claude_answer(final_instructions, conversation_history, prompt)
-        # answer, conversation_history = get_openai_answer(final_instructions, conversation_history, prompt)
+        conversation_history, new_prompt = conversation.conversation()
+        chunks = []
+        attempt_usage = {}
+        started = time.perf_counter()
+        for chunk in stream_answer(final_instructions, conversation_history, new_prompt, usage=attempt_usage, temperature=temperature):
+            if should_stop is not None and should_stop():
+                return None
+            if not chunks:
+                attempt_usage["first_token_seconds"] = time.perf_counter() - started
+            chunks.append(chunk)
+            yield "token", {"candidate": candidate, "attempt": attempt_counter, "text": chunk}
+        attempt_usage["generation_seconds"] = time.perf_counter() - started
+        answer = "".join(chunks)
+        for field, value in attempt_usage.items():
+            usage[field] = usage.get(field, 0) + value
+        print(f"\U0001F4B0 Tokens: {attempt_usage.get('input_tokens', 0)} in, {attempt_usage.get('output_tokens', 0)} out, "
+              f"{attempt_usage.get('cache_read_input_tokens', 0)} read from cache, "
+              f"{attempt_usage.get('cache_creation_input_tokens', 0)} written to cache, "
+              f"first token after {attempt_usage.get('first_token_seconds', 0):.1f}s")
 
         # BYPASS THE CHECK FOR HOOK FLAGS AT DEPLOY TIME
-        answer=remove_last_brace(answer)
-        answer +="""   function validateHookAddress(BaseHook _this) internal pure override {
-            }
-        }"""
-        answer = markdown_to_text(answer)
-        answer = remove_triple_backtick(answer)
-        save_to_sol(answer, "../foundry_hook_playground/src/generated/", file_name)
-        _, stderr, returncode = compile_contract(file_name)
-        prompt = "I get this error when compiling the contract: \n\n"+stderr+"\n\nOUTPUT: Only the fixed solidity code"
+        answer = prepare_source(answer)
+        if should_stop is not None and should_stop():
+            return None
+        file_name = generated_file_name(answer)
+        save_to_sol(answer, workspace.generated_dir, file_name)
+        build = workspace.compiler.compile(file_name)
+        stderr, returncode = build["stderr"], build["returncode"]
+        yield "compile", {"candidate": candidate, "attempt": attempt_counter, "returncode": returncode, "stderr": stderr,
+                          "diagnostics": build["diagnostics"], "elapsed": build["elapsed"],
+                          "cached": build["cached"], "usage": attempt_usage}
+        if (returncode)!=0:
+            answer, build, file_name = yield from auto_fix(answer, build, workspace, file_name, candidate, attempt_counter)
+            stderr, returncode = build["stderr"], build["returncode"]
         if (returncode)!=0:
+            conversation.add_attempt(answer, build)
             print("\u274CError compiling - Attempting LLM fix")
             print(stderr)
             print("-----------------------")
+            attempt_counter+=1
+
+    return answer, build, file_name
+
+def race_candidates(prompt, final_instructions, usage):
+    """
+    Speculative generation: run `SPECULATIVE_CANDIDATES` candidates in parallel, each with
+    its provider and temperature from `CANDIDATE_SETTINGS` and its own workspace, and return
+    the first one that compiles. The others stop at their next chunk or before their next
+    compile. Yields the events of all candidates; returns like `generate_candidate`.
+    """
+    events = queue.Queue()
+    stop = threading.Event()
+    done = object()
+    candidate_usages = []
+
+    def run_candidate(candidate, provider, temperature):
+        candidate_usage = {}
+        candidate_usages.append(candidate_usage)
+        result = None
+        try:
+            # Workspaces are per candidate, a cancelled one cleans up after its last step
+            with build_workspaces.workspace() as workspace:
+                steps = generate_candidate(prompt, final_instructions, workspace, candidate_usage, candidate,
+                                           provider, temperature, should_stop=stop.is_set)
+                while True:
+                    try:
+                        events.put(next(steps))
+                    except StopIteration as finished:
+                        result = finished.value
+                        break
+        except Exception as e:
+            print(f"\u274C Candidate {candidate} failed: {e}")
+        events.put((done, result))
+
+    settings = CANDIDATE_SETTINGS[:SPECULATIVE_CANDIDATES]
+    for candidate, (provider, temperature) in enumerate(settings):
+        threading.Thread(target=run_candidate, args=(candidate, provider, temperature), daemon=True).start()
+
+    result = None
+    try:
+        finished = 0
+        while finished < len(settings):
+            event, data = events.get()
+            if event is not done:
+                yield event, data
+                continue
+            finished += 1
+            if data is not None:
+                result = data
+                if data[1]["returncode"] == 0:
+                    break
+    finally:
+        # Also reached when the client goes away mid-race
+        stop.set()
+        for candidate_usage in list(candidate_usages):
+            for field, value in list(candidate_usage.items()):
+                usage[field] = usage.get(field, 0) + value
+    return result
+
+def constructor_values(constructor_types, values, address):
+    """
+    Values of the hook's constructor arguments: the ones given in the request, or else
+    `address` for every argument of a constructor taking only addresses, as the frontend
+    deploys with the wallet address for each argument.
+    """
+    if values is not None:
+        return values
+    if all(abi_type == "address" for abi_type in constructor_types) and (address or not constructor_types):
+        return [address] * len(constructor_types)
+    raise ValueError(f"constructor_args are needed to mine the salt of a constructor taking ({', '.join(constructor_types)})")
+
+def generate_hook(prompt, deployer_address, constructor_args=None, pool_manager_address=None):
+    """
+    Run the hook pipeline: RAG, generate/compile rounds, then background salt mining.
+
+    The salt is mined for the init code with the ABI-encoded constructor arguments: the
+    `constructor_args` values if given, else `pool_manager_address`, POOL_MANAGER_ADDRESS or
+    `deployer_address` for every address argument.
+
+    Yields (event, data) tuples as the pipeline progresses: `rag`, `token` for every chunk
+    of LLM output, `compile` for every attempt, `autofix` for every rebuild after a
+    deterministic patch, then `compiled` with the artifact and the mining job ID, or `error`
+    if no attempt compiled. With `SPECULATIVE_CANDIDATES` above 1, the events of the racing
+    candidates are interleaved.
+    """
+    print(f"----\n\u26A1\u26A1 Incoming Hook Prompt \u26A1\u26A1: {prompt}\n")
+    load_examples()
+    # RAG runs on the LLM loop while the build workspace is prepared
+    rag_future = async_llm.submit(rag_async(prompt))
+    speculative = SPECULATIVE_CANDIDATES > 1
+
+    # Private project copy, so concurrent requests do not overwrite each other's files.
+    # Speculative candidates each build in a workspace of their own.
+    with (nullcontext() if speculative else build_workspaces.workspace()) as workspace:
+        rag_files = rag_future.result()
+        print(f"\U0001F50E RAG Top 5 Example Hooks: {rag_files}\n")
+        yield "rag", rag_files
+
+        final_instructions = build_system_prompt(rag_files)
+        usage = {}
+
+        if speculative:
+            result = yield from race_candidates(prompt, final_instructions, usage)
         else:
-            print("\U0001F389 \U0001F389 \U0001F389 Hook compiled! \U0001F389 \U0001F389 \U0001F389\n")
-            contract_name = extract_contract_name(answer)
-            last_contract_deployed=contract_name
-            with open(f"../foundry_hook_playground/out/{file_name}/{contract_name}.json", 'r') as file:
-                contract_json = json.load(file)
-
-            print("\u26CF \u26CF \u26CF Mining Hook CREATE2 Salt \u26CF \u26CF \u26CF")
-            #Extract the flag states from the Solidity code
-            flag_states = extract_flags_from_code(answer)
-            required_flags = calculate_flags(flag_states)
-            bytecode = contract_json["bytecode"]["object"]
-            hook_address, salt = find(deployer_address, required_flags, 0, hex_to_bytes(bytecode), hex_to_bytes(deployer_address))
-            print(f'\U0001F680Found hook address: {hook_address} with Salt: {salt}')
-            
-            print("\u2705 Returning JSON with code, bytecode, ABI and CREATE2 Salt\n") 
-            last_n_arguments_in_constructor = n_arguments_in_constructor(answer)
-            last_contract_deployed
-
-            write_to_file("last_contract_deployed.txt", str(last_contract_deployed))
-            write_to_file("last_n_arguments_in_constructor.txt", str(last_n_arguments_in_constructor))
-
-            return jsonify(solidity_code=answer, bytecode=bytecode, abi=contract_json["abi"], salt=salt, n_constructor=last_n_arguments_in_constructor)
-        attempt_counter+=1
-        
+            result = yield from generate_candidate(prompt, final_instructions, workspace, usage)
+
+    if result is None or result[1]["returncode"] != 0:
+        stderr = result[1]["stderr"] if result is not None else ""
+        yield "error", {"error": "Could not compile the generated hook", "stderr": stderr, "usage": usage}
+        return
+
+    answer, build, file_name = result
+    print("\U0001F389 \U0001F389 \U0001F389 Hook compiled! \U0001F389 \U0001F389 \U0001F389\n")
+    # Contract name, constructor types and permissions, read from the AST of the build
+    hook = build.get("hook")
+    if hook is None:
+        yield "error", {"error": "The generated source has no concrete hook contract", "stderr": "", "usage": usage}
+        return
+    contract_name = hook['contract']
+    contract_json = build["artifacts"][contract_name]
+
+    print("\u26CF \u26CF \u26CF Mining Hook CREATE2 Salt in the background \u26CF \u26CF \u26CF")
+    required_flags = calculate_flags(hook['permissions'])
+    bytecode = contract_json["bytecode"]["object"]
+    mining_job_id, mining_error, encoded_args, init_code_hash = None, None, None, None
+    try:
+        values = constructor_values(hook['constructor_types'], constructor_args,
+                                    pool_manager_address or POOL_MANAGER_ADDRESS or deployer_address)
+        # Encoded once: the deployment must use exactly the init code the salt is mined for
+        encoded_args = encode_constructor_args(hook['constructor_types'], values)
+        init_code_hash = Web3.to_hex(keccak(hex_to_bytes(bytecode) + encoded_args))
+        mining_job_id = mining_jobs.submit(deployer_address, required_flags, hex_to_bytes(bytecode), encoded_args)
+        print(f'\U0001F680Mining job: {mining_job_id}')
+    except (ValueError, TypeError) as e:
+        mining_error = str(e)
+        print(f"\u274C Salt mining not started: {mining_error}")
+
+    last_n_arguments_in_constructor = len(hook['constructor_types'])
+
+    # Everything /verify needs, so it does not depend on whichever hook compiled last
+    build_id = artifact_store.put({
+        'contract': contract_name,
+        'file_name': file_name,
+        'source': answer,
+        'abi': contract_json["abi"],
+        'constructor_types': hook['constructor_types'],
+        'constructor_args': Web3.to_hex(encoded_args) if encoded_args is not None else None,
+        'solc_version': build_workspaces.base.solc_version,
+        'compiler_settings': compiler_settings(build_workspaces.project_dir),
+    })
+
+    yield "compiled", dict(build_id=build_id, solidity_code=answer, bytecode=bytecode, abi=contract_json["abi"], mining_job_id=mining_job_id, mining_error=mining_error, n_constructor=last_n_arguments_in_constructor,
+                           constructor_types=hook['constructor_types'], constructor_args=Web3.to_hex(encoded_args) if encoded_args is not None else None,
+                           init_code_hash=init_code_hash, permissions=hook['permissions'], usage=usage)
+
+
+def server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/invoke', methods=['POST'])
+@invoke_admission
+def invoke():
+    data = request.get_json()
+    for event, event_data in generate_hook(data.get('prompt'), data.get('deployer_address'),
+                                           data.get('constructor_args'), data.get('pool_manager_address')):
+        if event == "compiled":
+            print("\u2705 Returning JSON with code, bytecode, ABI and CREATE2 mining job\n")
+            return jsonify(event_data)
+        if event == "error":
+            return jsonify(event_data), 500
+
+
+@app.route('/invoke/stream', methods=['POST'])
+@invoke_admission
+def invoke_stream():
+    """
+    Server-sent events version of /invoke. Streams the pipeline events, then `mining`
+    progress until the salt is found, and finally the `artifact` with the salt.
+    """
+    data = request.get_json()
+    prompt = data.get('prompt')
+    deployer_address = data.get('deployer_address')
+
+    def events():
+        yield server_sent_event("start", {"prompt": prompt})
+        mining_job_id = None
+        try:
+            for event, event_data in generate_hook(prompt, deployer_address,
+                                                   data.get('constructor_args'), data.get('pool_manager_address')):
+                yield server_sent_event(event, event_data)
+                if event == "error":
+                    return
+                if event == "compiled":
+                    artifact = event_data
+                    mining_job_id = artifact["mining_job_id"]
+            if mining_job_id is None:
+                yield server_sent_event("error", {"error": f"Salt mining not started: {artifact['mining_error']}"})
+                return
+
+            while True:
+                status = mining_jobs.status(mining_job_id)
+                yield server_sent_event("mining", status)
+                if status["status"] not in ("queued", "running"):
+                    break
+                time.sleep(0.5)
+            if status["status"] != "done":
+                yield server_sent_event("error", {"error": f"Salt mining {status['status']}", "mining": status})
+                return
+            mining_job_id = None
+            yield server_sent_event("artifact", dict(artifact, salt=status["salt"], hook_address=status["hook_address"]))
+        except Exception as e:
+            # An LLM, RAG or compiler failure, reported instead of cutting the stream short
+            print(f"\u274C Hook stream failed: {e}")
+            yield server_sent_event("error", {"error": str(e)})
+        finally:
+            # The client went away before mining ended
+            if mining_job_id is not None:
+                mining_jobs.cancel(mining_job_id)
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route('/metrics/llm', methods=['GET'])
+def llm_metrics():
+    """
+    Token usage of the Claude calls since start-up, with the share of input tokens read from the prompt cache.
+    """
+    totals = dict(async_llm.usage_totals)
+    input_tokens = totals["input_tokens"] + totals["cache_creation_input_tokens"] + totals["cache_read_input_tokens"]
+    totals["cache_hit_rate"] = totals["cache_read_input_tokens"] / input_tokens if input_tokens else 0
+    return jsonify(totals)
+
+@app.route('/mining/<job_id>', methods=['GET'])
+def mining_status(job_id):
+    status = mining_jobs.status(job_id)
+    if status is None:
+        return jsonify(error="Unknown mining job"), 404
+    return jsonify(status)
+
+@app.route('/mining/<job_id>/cancel', methods=['POST'])
+def cancel_mining(job_id):
+    status = mining_jobs.cancel(job_id)
+    if status is None:
+        return jsonify(error="Unknown mining job"), 404
+    return jsonify(status)
+
 
 @app.route('/verify', methods=['POST'])
 def verify():
-    last_contract_deployed = read_from_file("last_contract_deployed.txt")
-    last_n_arguments_in_constructor = int(read_from_file("last_n_arguments_in_constructor.txt"))
-    print(last_n_arguments_in_constructor)
-    print(last_contract_deployed)
-    contract_address = request.get_json().get('contract_address')
-    constructor_address = request.get_json().get('constructor_address')
-    print(f"!! VERIFY -- {contract_address}, {constructor_address}")
-    command = f"forge verify-contract {contract_address} --verifier blockscout {last_contract_deployed} --constructor-args {multiply_string_with_commas(constructor_address, last_n_arguments_in_constructor)} --chain sepolia --verifier-url https://eth-sepolia.blockscout.com/api"
-    working_directory = "../foundry_hook_playground"
-    print(command)
-    # Run the command in the specified directory
-    result = subprocess.run(command, shell=True, capture_output=True, text=True, cwd=working_directory)
-    print(f"!! Blockscout API verify called")
-    return jsonify(success=True)
+    """
+    Queue the verification of a deployed hook against the build it came from, and return
+    the verification job (202). Poll GET /verify/<job_id> for its status.
+
+    Takes the `build_id` returned by /invoke and the `contract_address`. The constructor
+    arguments are the `constructor_args` values if given, else `constructor_address` for
+    every argument, else the arguments the salt was mined with.
+    """
+    data = request.get_json()
+    build = artifact_store.get(data.get('build_id'))
+    if build is None:
+        return jsonify(error="Unknown build_id"), 404
+    contract_address = data.get('contract_address')
+    if not Web3.is_address(contract_address or ""):
+        return jsonify(error="Invalid contract_address"), 400
+    constructor_address = data.get('constructor_address')
+    print(f"!! VERIFY -- {build['build_id']} {build['contract']} at {contract_address}, {constructor_address}")
+
+    try:
+        if data.get('constructor_args') is not None:
+            encoded_args = Web3.to_hex(encode_constructor_args(build['constructor_types'], data['constructor_args']))
+        elif constructor_address:
+            values = constructor_values(build['constructor_types'], None, constructor_address)
+            encoded_args = Web3.to_hex(encode_constructor_args(build['constructor_types'], values))
+        else:
+            encoded_args = build['constructor_args']
+    except (ValueError, TypeError) as e:
+        return jsonify(error=str(e)), 400
+
+    job_id = verification_jobs.submit(build, contract_address, encoded_args)
+    return jsonify(verification_jobs.status(job_id)), 202
+
+@app.route('/verify/<job_id>', methods=['GET'])
+def verification_status(job_id):
+    status = verification_jobs.status(job_id)
+    if status is None:
+        return jsonify(error="Unknown verification job"), 404
+    return jsonify(status)
+
 
+# The routes are registered, the app is created under any server. Mining processes
+# import this module too when the app is run as a script, they skip the warm-up
+if WARM_UP_ON_START and multiprocessing.parent_process() is None:
+    start_warm_up()
 
 if __name__ == '__main__':
     app.run(host="0.0.0.0",port=os.environ.get("PORT"), debug=True)
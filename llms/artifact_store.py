@@ -0,0 +1,78 @@
+import json
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+BUILD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ArtifactStore:
+    """
+    Bounded store of compiled hooks keyed by build ID, so that a deployment can be verified
+    against the exact build it came from.
+
+    The `max_builds` most recently used records are kept in memory. With a `directory`,
+    records are also written there as JSON and read back once they left memory.
+    """
+
+    def __init__(self, max_builds=256, directory=None):
+        """
+        :param max_builds: Records kept in memory
+        :param directory: Optional folder persisting every record
+        """
+        self.max_builds = max_builds
+        self.directory = directory
+        self._builds = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def put(self, record):
+        """
+        Store a build.
+
+        :param record: JSON-serialisable dictionary describing the build
+        :return: The new build ID
+        """
+        build_id = uuid.uuid4().hex
+        record = dict(record, build_id=build_id)
+        if self.directory:
+            path = self._path(build_id)
+            with open(f"{path}.tmp", 'w') as file:
+                json.dump(record, file)
+            os.replace(f"{path}.tmp", path)
+        with self._lock:
+            self._remember(build_id, record)
+        return build_id
+
+    def get(self, build_id):
+        """
+        :return: The record of a build, or None for an unknown build ID
+        """
+        if not isinstance(build_id, str) or not BUILD_ID_PATTERN.match(build_id):
+            return None
+        with self._lock:
+            if build_id in self._builds:
+                self._builds.move_to_end(build_id)
+                return self._builds[build_id]
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(build_id), 'r') as file:
+                record = json.load(file)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._remember(build_id, record)
+        return record
+
+    def _path(self, build_id):
+        return os.path.join(self.directory, f"{build_id}.json")
+
+    def _remember(self, build_id, record):
+        self._builds[build_id] = record
+        self._builds.move_to_end(build_id)
+        while len(self._builds) > self.max_builds:
+            self._builds.popitem(last=False)
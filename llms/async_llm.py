@@ -0,0 +1,273 @@
+import asyncio
+import os
+import queue
+import threading
+from types import SimpleNamespace
+
+import anthropic
+import backoff
+import httpx
+import openai
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+
+CLAUDE_MODEL = "claude-3-5-sonnet-20240620"
+OPENAI_MODEL = "gpt-4o"
+
+LLM_TIMEOUT = httpx.Timeout(float(os.environ.get("LLM_TIMEOUT", 120)),
+                            connect=float(os.environ.get("LLM_CONNECT_TIMEOUT", 10)))
+LLM_LIMITS = httpx.Limits(max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", 32)),
+                          max_keepalive_connections=int(os.environ.get("LLM_MAX_KEEPALIVE_CONNECTIONS", 16)))
+# Long hooks were cut off at 2000 tokens; 4096 is the model's default output limit
+LLM_MAX_OUTPUT_TOKENS = int(os.environ.get("LLM_MAX_OUTPUT_TOKENS", 4096))
+LLM_MAX_TRIES = int(os.environ.get("LLM_MAX_TRIES", 4))
+# Upper bound in seconds of the jittered wait between two tries
+LLM_MAX_RETRY_WAIT = float(os.environ.get("LLM_MAX_RETRY_WAIT", 20))
+
+# 429, 5xx, timeouts and dropped connections
+RETRYABLE_ERRORS = (
+    anthropic.RateLimitError, anthropic.InternalServerError,
+    anthropic.APITimeoutError, anthropic.APIConnectionError,
+    openai.RateLimitError, openai.InternalServerError,
+    openai.APITimeoutError, openai.APIConnectionError,
+)
+
+# The pinned SDK exposes prompt caching as a beta, enabled by this header
+PROMPT_CACHING_HEADERS = {"anthropic-beta": "prompt-caching-2024-07-31"}
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+# Token usage of all LLM calls since start-up, only updated from the LLM loop
+usage_totals = dict.fromkeys(USAGE_FIELDS + ("calls",), 0)
+
+_loop = None
+_loop_lock = threading.Lock()
+_clients = {}
+
+
+def get_loop():
+    """
+    Return the event loop all LLM calls run on, started in a daemon thread on first use.
+    One loop owns the pooled HTTP clients, so connections are reused across Flask threads.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-loop", daemon=True).start()
+        return _loop
+
+
+def submit(coroutine):
+    """
+    Schedule a coroutine on the LLM loop from synchronous code.
+
+    :return: A `concurrent.futures.Future` with its result
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, get_loop())
+
+
+def run(coroutine):
+    """
+    Run a coroutine on the LLM loop and wait for its result.
+    """
+    return submit(coroutine).result()
+
+
+def iterate(async_generator):
+    """
+    Consume an async generator on the LLM loop as a plain generator. Closing the returned
+    generator early cancels the underlying one.
+    """
+    items = queue.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for item in async_generator:
+                items.put((item, None))
+        except Exception as e:
+            items.put((done, e))
+        else:
+            items.put((done, None))
+
+    future = submit(pump())
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        future.cancel()
+
+
+def _http_client():
+    return httpx.AsyncClient(limits=LLM_LIMITS, timeout=LLM_TIMEOUT)
+
+
+def anthropic_client():
+    # Only called from the LLM loop, so no lock is needed
+    if "anthropic" not in _clients:
+        _clients["anthropic"] = AsyncAnthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"), timeout=LLM_TIMEOUT,
+                                               max_retries=0, http_client=_http_client())
+    return _clients["anthropic"]
+
+
+def openai_client():
+    if "openai" not in _clients:
+        _clients["openai"] = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"), timeout=LLM_TIMEOUT,
+                                         max_retries=0, http_client=_http_client())
+    return _clients["openai"]
+
+
+async def _create_clients():
+    anthropic_client()
+    openai_client()
+
+
+def warm_up():
+    """
+    Start the LLM loop and create the pooled clients ahead of the first request.
+    """
+    run(_create_clients())
+
+
+def _retry_wait(attempt):
+    return backoff.full_jitter(min(LLM_MAX_RETRY_WAIT, 2 ** attempt))
+
+
+retry = backoff.on_exception(backoff.expo, RETRYABLE_ERRORS, max_tries=LLM_MAX_TRIES,
+                             max_value=LLM_MAX_RETRY_WAIT, jitter=backoff.full_jitter)
+
+
+def cached_block(text):
+    """
+    Wrap text as a system prompt block marked as a cacheable prefix. Everything up to and
+    including the block is cached by the provider; at most 4 blocks can be marked.
+    """
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def record_usage(usage, message_usage):
+    """
+    Add the token usage of a response to `usage` (if given) and to `usage_totals`.
+    The cache fields are missing when nothing was cached, and from OpenAI responses.
+    """
+    for totals in (usage, usage_totals):
+        if totals is None:
+            continue
+        for field in USAGE_FIELDS:
+            totals[field] = totals.get(field, 0) + (getattr(message_usage, field, None) or 0)
+        totals["calls"] = totals.get("calls", 0) + 1
+
+
+@retry
+async def _create_claude_message(**kwargs):
+    return await anthropic_client().messages.create(**kwargs)
+
+
+async def claude_answer(instructions, conversation_history, new_prompt, max_tokens=LLM_MAX_OUTPUT_TOKENS, model=CLAUDE_MODEL, usage=None):
+    """
+    :param instructions: System prompt, a string or a list of blocks (see `cached_block`)
+    :param usage: Optional dictionary the token usage is added to
+    """
+    conversation_history.append({"role": "user", "content": new_prompt})
+    message = await _create_claude_message(
+        max_tokens=max_tokens,
+        system=instructions,
+        messages=conversation_history,
+        model=model,
+        extra_headers=PROMPT_CACHING_HEADERS,
+    )
+    record_usage(usage, message.usage)
+    conversation_history.append({"role": "assistant", "content": message.content[0].text})
+    return message.content[0].text, conversation_history
+
+
+async def claude_stream(instructions, conversation_history, new_prompt, max_tokens=LLM_MAX_OUTPUT_TOKENS, model=CLAUDE_MODEL, usage=None, temperature=None):
+    """
+    Yield the answer as text chunks. A failed stream is retried only if no chunk was
+    delivered yet, so callers never see a chunk twice.
+
+    :param usage: Optional dictionary the token usage is added to once the stream ends
+    :param temperature: Sampling temperature, None for the model default
+    """
+    kwargs = {"temperature": temperature} if temperature is not None else {}
+    conversation_history.append({"role": "user", "content": new_prompt})
+    chunks = []
+    for attempt in range(LLM_MAX_TRIES):
+        try:
+            async with anthropic_client().messages.stream(
+                max_tokens=max_tokens,
+                system=instructions,
+                messages=conversation_history,
+                model=model,
+                extra_headers=PROMPT_CACHING_HEADERS,
+                **kwargs,
+            ) as stream:
+                async for text in stream.text_stream:
+                    chunks.append(text)
+                    yield text
+                record_usage(usage, (await stream.get_final_message()).usage)
+            break
+        except RETRYABLE_ERRORS:
+            if chunks or attempt == LLM_MAX_TRIES - 1:
+                raise
+            await asyncio.sleep(_retry_wait(attempt))
+    conversation_history.append({"role": "assistant", "content": "".join(chunks)})
+
+
+@retry
+async def _create_openai_completion(**kwargs):
+    return await openai_client().chat.completions.create(**kwargs)
+
+
+async def openai_answer(instructions, conversation_history, new_prompt, json_output=False, model=OPENAI_MODEL):
+    if len(conversation_history)==0:
+        conversation_history.append({"role": "system", "content": instructions})
+    conversation_history.append({"role": "user", "content": new_prompt})
+
+    kwargs = {"response_format": {"type": "json_object"}} if json_output else {}
+    completion = await _create_openai_completion(model=model, messages=conversation_history, **kwargs)
+
+    conversation_history.append({"role": "assistant", "content": completion.choices[0].message.content})
+    return completion.choices[0].message.content, conversation_history
+
+
+async def openai_stream(instructions, conversation_history, new_prompt, model=OPENAI_MODEL, usage=None, temperature=None):
+    """
+    OpenAI counterpart of `claude_stream`. `instructions` may be the system prompt blocks
+    used for Claude, they are sent as one system message.
+    """
+    if isinstance(instructions, list):
+        instructions = "".join(block["text"] for block in instructions)
+    conversation_history.append({"role": "user", "content": new_prompt})
+    messages = [{"role": "system", "content": instructions}] + conversation_history
+    kwargs = {"temperature": temperature} if temperature is not None else {}
+    chunks = []
+    for attempt in range(LLM_MAX_TRIES):
+        try:
+            stream = await openai_client().chat.completions.create(
+                model=model, messages=messages, stream=True,
+                stream_options={"include_usage": True}, **kwargs)
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    record_usage(usage, SimpleNamespace(input_tokens=chunk.usage.prompt_tokens,
+                                                        output_tokens=chunk.usage.completion_tokens))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunks.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            break
+        except RETRYABLE_ERRORS:
+            if chunks or attempt == LLM_MAX_TRIES - 1:
+                raise
+            await asyncio.sleep(_retry_wait(attempt))
+    conversation_history.append({"role": "assistant", "content": "".join(chunks)})
+
+
+@retry
+async def embed(texts, model="text-embedding-3-small"):
+    response = await openai_client().embeddings.create(input=texts, model=model)
+    return [item.embedding for item in response.data]
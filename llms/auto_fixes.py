@@ -0,0 +1,214 @@
+import os
+import re
+from collections import Counter
+
+IMPORT_PATTERN = re.compile(r'^\s*import\s*\{([^}]*)\}\s*from\s*"([^"]+)"\s*;', re.MULTILINE)
+FUNCTION_PATTERN = re.compile(r'\bfunction\s+(\w+)\s*\(')
+
+GET_HOOK_PERMISSIONS_HEADER = "function getHookPermissions() public pure override returns (Hooks.Permissions memory) "
+MUTABILITY_PATTERN = re.compile(r'changes state mutability from "(\w+)" to "(\w+)"')
+
+# solc error codes
+DUPLICATE_FUNCTION = "1686"
+UNDECLARED_IDENTIFIER = "7576"
+IDENTIFIER_NOT_FOUND = "7920"
+MISSING_OVERRIDE = "9456"
+VISIBILITY_DIFFERS = "9098"
+MUTABILITY_DIFFERS = "6959"
+RETURN_TYPES_DIFFER = "4822"
+
+
+def build_import_map(sources):
+    """
+    Map every identifier imported by the example contracts to an import statement for it,
+    using the most common path.
+
+    :param sources: Iterable of Solidity sources
+    :return: Dictionary mapping identifiers to `import {Name} from "path";`
+    """
+    paths = {}
+    for source in sources:
+        for names, path in IMPORT_PATTERN.findall(source):
+            for name in names.split(","):
+                name = name.strip().split(" as ")[0].strip()
+                if name:
+                    paths.setdefault(name, Counter())[path] += 1
+    return {name: f'import {{{name}}} from "{counter.most_common(1)[0][0]}";' for name, counter in paths.items()}
+
+
+def char_offset(source, byte_offset):
+    """
+    Convert a solc byte offset into an index in the decoded source.
+    """
+    return len(source.encode()[:byte_offset].decode(errors='ignore'))
+
+
+def diagnostic_text(source, diagnostic):
+    """
+    :return: The source text a diagnostic points at, or None without a location
+    """
+    if diagnostic.get('start') is None or diagnostic.get('end') is None:
+        return None
+    return source[char_offset(source, diagnostic['start']):char_offset(source, diagnostic['end'])]
+
+
+def function_span(source, start):
+    """
+    Find the function definition enclosing or starting at `start`.
+
+    :return: (start of `function`, index of the opening brace, index after the closing brace), or None
+    """
+    header_start = source.rfind("function", 0, start + len("function"))
+    if header_start == -1:
+        return None
+    body_start = source.find("{", header_start)
+    if body_start == -1:
+        return None
+    depth = 0
+    for i in range(body_start, len(source)):
+        if source[i] == "{":
+            depth += 1
+        elif source[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return header_start, body_start, i + 1
+    return None
+
+
+def fix_duplicate_validate_hook_address(source, diagnostic):
+    """
+    The generated contract defines `validateHookAddress` next to the stub appended to bypass
+    the address check: drop the generated one, so the address is not validated.
+    """
+    if diagnostic['code'] != DUPLICATE_FUNCTION:
+        return None
+    definitions = [match.start() for match in FUNCTION_PATTERN.finditer(source) if match.group(1) == "validateHookAddress"]
+    if len(definitions) < 2:
+        return None
+    span = function_span(source, definitions[0])
+    if span is None:
+        return None
+    return source[:span[0]] + source[span[2]:]
+
+
+def fix_get_hook_permissions_signature(source, diagnostic):
+    """
+    Replace a `getHookPermissions` header that does not match `BaseHook` with the expected one.
+    """
+    if diagnostic['code'] not in (MISSING_OVERRIDE, VISIBILITY_DIFFERS, MUTABILITY_DIFFERS, RETURN_TYPES_DIFFER):
+        return None
+    text = diagnostic_text(source, diagnostic)
+    if text is None or "getHookPermissions" not in text:
+        return None
+    span = function_span(source, char_offset(source, diagnostic['start']))
+    if span is None or source[span[0]:span[1]].split() == GET_HOOK_PERMISSIONS_HEADER.split():
+        return None
+    return source[:span[0]] + GET_HOOK_PERMISSIONS_HEADER + source[span[1]:]
+
+
+def fix_missing_override(source, diagnostic):
+    """
+    Add the `override` specifier to a hook callback, before its return types or its body.
+    """
+    if diagnostic['code'] != MISSING_OVERRIDE or diagnostic.get('start') is None:
+        return None
+    span = function_span(source, char_offset(source, diagnostic['start']))
+    if span is None:
+        return None
+    header = source[span[0]:span[1]]
+    returns = re.search(r'\breturns\b', header)
+    insert_at = span[0] + returns.start() if returns else span[1]
+    return source[:insert_at].rstrip() + " override " + source[insert_at:].lstrip()
+
+
+def fix_state_mutability(source, diagnostic):
+    """
+    Give an overriding function the state mutability of the function it overrides.
+    """
+    match = MUTABILITY_PATTERN.search(diagnostic['message'])
+    if diagnostic['code'] != MUTABILITY_DIFFERS or match is None or diagnostic.get('start') is None:
+        return None
+    expected, actual = match.groups()
+    span = function_span(source, char_offset(source, diagnostic['start']))
+    if span is None:
+        return None
+    header = source[span[0]:span[1]]
+    if actual == "nonpayable":
+        fixed = re.sub(r'\b(external|public|internal|private)\b', rf'\1 {expected}', header, count=1)
+    else:
+        fixed = re.sub(rf'\s*\b{actual}\b', "" if expected == "nonpayable" else f" {expected}", header, count=1)
+    if fixed == header:
+        return None
+    return source[:span[0]] + fixed + source[span[1]:]
+
+
+# Rules patching the source at a diagnostic's location, tried in order
+AUTO_FIX_RULES = [
+    fix_duplicate_validate_hook_address,
+    fix_get_hook_permissions_signature,
+    fix_missing_override,
+    fix_state_mutability,
+]
+
+
+def missing_imports(source, diagnostics, import_map):
+    """
+    :return: The import statements for undeclared identifiers that the examples import
+    """
+    imported = {name.strip().split(" as ")[-1].strip()
+                for names, _ in IMPORT_PATTERN.findall(source) for name in names.split(",")}
+    statements = []
+    for diagnostic in diagnostics:
+        if diagnostic['code'] not in (UNDECLARED_IDENTIFIER, IDENTIFIER_NOT_FOUND):
+            continue
+        text = diagnostic_text(source, diagnostic)
+        # `Hooks.Permissions` is reported on the whole path
+        name = text.split(".")[0].strip() if text else None
+        if name in import_map and name not in imported and import_map[name] not in statements:
+            statements.append(import_map[name])
+    return statements
+
+
+def add_imports(source, statements):
+    """
+    Insert import statements after the last import, or after the pragma.
+    """
+    anchors = list(IMPORT_PATTERN.finditer(source)) or list(re.finditer(r'^\s*pragma\b[^;]*;', source, re.MULTILINE))
+    insert_at = anchors[-1].end() if anchors else 0
+    return source[:insert_at] + "\n" + "\n".join(statements) + source[insert_at:]
+
+
+def apply_auto_fixes(source, diagnostics, import_map):
+    """
+    Apply the deterministic fixes for the errors of a build.
+
+    Location based rules run from the last diagnostic to the first, so that a patch does not
+    move the offsets of the diagnostics still to handle; a diagnostic overlapping an earlier
+    patch is left for the next build. Missing imports are looked up in the original source
+    and added last.
+
+    :param source: The Solidity source that was compiled
+    :param diagnostics: Its diagnostics, see `CompileServer.parse_diagnostics`
+    :param import_map: See `build_import_map`
+    :return: (patched source, names of the rules applied), nothing applied if the list is empty
+    """
+    errors = [d for d in diagnostics if d['severity'] == 'error']
+    statements = missing_imports(source, errors, import_map)
+    applied = []
+    # Start of the earliest patch so far, the offsets of diagnostics reaching past it are stale
+    patched_from = len(source)
+    for diagnostic in sorted(errors, key=lambda d: d.get('start') or -1, reverse=True):
+        if diagnostic.get('end') is not None and char_offset(source, diagnostic['end']) > patched_from:
+            continue
+        for rule in AUTO_FIX_RULES:
+            fixed = rule(source, diagnostic)
+            if fixed is not None:
+                patched_from = min(patched_from, len(os.path.commonprefix([source, fixed])))
+                source = fixed
+                applied.append(rule.__name__)
+                break
+
+    if statements:
+        source = add_imports(source, statements)
+        applied.append("add_missing_imports")
+    return source, applied
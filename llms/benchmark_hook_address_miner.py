@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of the per-candidate cost of testing a CREATE2 salt in hook_address_miner.
+
+Usage: python benchmark_hook_address_miner.py [n_candidates]
+"""
+import sys
+import time
+
+from eth_utils import keccak, to_bytes
+from web3 import Web3
+
+from hook_address_miner import ethereum_address_to_binary_and_least_14_bits, _scan_batch
+
+DEPLOYER = "0x4e59b44847b379578588920cA78FbF26c0B4956C"
+CREATION_CODE = bytes.fromhex("6080604052348015600e575f80fd5b50")
+# Flags that never match inside the sampled range, so every candidate is hashed
+FLAGS = -1
+
+
+def legacy_candidate(salt, creation_code_hash):
+    # Per-salt work done before the batched worker loop: ABI packing through
+    # solidity_keccak, a checksummed string, then a 160-character binary string
+    address = Web3.to_checksum_address(Web3.solidity_keccak(
+        ['bytes1', 'address', 'bytes32', 'bytes32'],
+        ['0xff', DEPLOYER, Web3.to_hex(salt.to_bytes(32, 'big')), Web3.to_hex(creation_code_hash)]
+    )[12:].hex())
+    return ethereum_address_to_binary_and_least_14_bits(address)[1]
+
+
+def run(label, n, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed / n * 1e6:8.2f} us/candidate  {n / elapsed:12,.0f} candidates/sec")
+
+
+def main(n):
+    creation_code_hash = keccak(CREATION_CODE)
+
+    def legacy():
+        for salt in range(n):
+            legacy_candidate(salt, creation_code_hash)
+
+    def batched():
+        _scan_batch((to_bytes(hexstr=DEPLOYER), creation_code_hash, frozenset([FLAGS]), 0, n))
+
+    print(f"{n} candidates")
+    run("before: checksum + hex parsing", n, legacy)
+    run("after: batched worker loop", n, batched)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,96 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from compile_server import CompileServer
+
+# Project entries shared read-only with every workspace through symlinks
+SHARED_ENTRIES = ["lib", "foundry.toml", "remappings.txt"]
+# Built by the warm-up of the base project: the dependencies generated hooks import. The
+# project's own sources are left out, workspaces do not use them and some do not compile
+WARM_TARGETS = ["lib/v4-periphery/contracts/BaseHook.sol"]
+
+
+class BuildWorkspace:
+    """
+    A private copy of the foundry project for one request, with its own compile server.
+    """
+
+    def __init__(self, path, timeout, cache=None):
+        self.path = path
+        self.generated_dir = os.path.join(path, "src", "generated")
+        self.compiler = CompileServer(path, timeout=timeout, warm=True, cache=cache)
+
+
+class BuildWorkspaces:
+    """
+    Hands out isolated build workspaces so concurrent requests can compile in parallel.
+
+    Each workspace symlinks the immutable `lib/` dependencies and the project configuration,
+    and starts from a copy of the base project's warm compiler cache, `out/` artifacts and
+    cache index, so forge does not rebuild the dependencies. Artifacts are copied rather than
+    linked since forge rewrites them in place. Generated sources and their artifacts stay
+    private to the workspace, which is removed on exit.
+    """
+
+    def __init__(self, project_dir="../foundry_hook_playground", root=None, timeout=120, cache=None):
+        """
+        :param project_dir: Root of the base foundry project
+        :param root: Directory the workspaces are created in, defaults to a folder of this process
+                     in the system temp dir, created on first use and removed at exit
+        :param timeout: Seconds after which a build is killed
+        :param cache: Optional `CompileCache` shared by all workspaces
+        """
+        self.project_dir = os.path.abspath(project_dir)
+        self.root = root
+        self.timeout = timeout
+        self.cache = cache
+        self.base = CompileServer(self.project_dir, timeout=timeout, warm_targets=WARM_TARGETS)
+        self._root_lock = threading.Lock()
+
+    def _workspace_root(self):
+        # Created lazily, processes importing the app without building (mining workers) get none
+        with self._root_lock:
+            if self.root is None:
+                self.root = tempfile.mkdtemp(prefix="hook-builds-")
+                atexit.register(shutil.rmtree, self.root, ignore_errors=True)
+            else:
+                os.makedirs(self.root, exist_ok=True)
+            return self.root
+
+    @contextmanager
+    def workspace(self):
+        """
+        Create a workspace, yield it as a `BuildWorkspace` and remove it afterwards.
+        """
+        self.base.warm_up()
+        path = tempfile.mkdtemp(prefix="build-", dir=self._workspace_root())
+        try:
+            for entry in SHARED_ENTRIES:
+                os.symlink(os.path.join(self.project_dir, entry), os.path.join(path, entry))
+            os.makedirs(os.path.join(path, "src", "generated"))
+            self._seed_cache(path)
+            yield BuildWorkspace(path, self.timeout, self.cache)
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _seed_cache(self, path):
+        base_out = os.path.join(self.project_dir, "out")
+        generated_sources = set(os.listdir(os.path.join(self.project_dir, "src", "generated")))
+        for directory, _, files in os.walk(base_out):
+            relative = os.path.relpath(directory, base_out)
+            # Artifacts of generated hooks belong to other requests
+            if relative.split(os.sep)[0] in generated_sources:
+                continue
+            target = os.path.join(path, "out", relative)
+            os.makedirs(target, exist_ok=True)
+            for file in files:
+                shutil.copy2(os.path.join(directory, file), os.path.join(target, file))
+
+        cache_file = os.path.join(self.project_dir, "cache", "solidity-files-cache.json")
+        if os.path.isfile(cache_file):
+            os.makedirs(os.path.join(path, "cache"))
+            shutil.copyfile(cache_file, os.path.join(path, "cache", "solidity-files-cache.json"))
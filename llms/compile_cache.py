@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import threading
+
+# Part of every key, bumped when the content of an entry changes
+CACHE_VERSION = 2
+
+
+def compiler_settings(project_dir):
+    """
+    Read the configuration that affects compilation: foundry.toml and remappings.txt.
+    """
+    settings = []
+    for name in ("foundry.toml", "remappings.txt"):
+        path = os.path.join(project_dir, name)
+        if os.path.isfile(path):
+            with open(path, 'r') as file:
+                settings.append(file.read())
+    return "\n".join(settings)
+
+
+class CompileCache:
+    """
+    Content-addressed cache of compile results on disk.
+
+    Entries are keyed by a hash of the exact source, its path in the project, the compiler
+    command and the compiler settings, which all end up in the bytecode's metadata hash,
+    and by `CACHE_VERSION`.
+    They hold the diagnostics, return code, artifacts (ABI and bytecode per contract) and
+    the `analyze_hook` result.
+    The least recently used entries are evicted once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory="compile_cache", max_bytes=256 * 1024 * 1024):
+        """
+        :param directory: Folder holding one JSON file per entry
+        :param max_bytes: Total size above which the least recently used entries are removed
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(source, path, command, settings):
+        """
+        :param source: The source file, as compiled
+        :param path: Path of the source file in the project
+        :param command: The compiler command line, as a list
+        :param settings: See `compiler_settings`
+        """
+        return hashlib.sha256(json.dumps([CACHE_VERSION, source, path, command, settings]).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """
+        :return: The cached compile result, or None
+        """
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, 'r') as file:
+                    result = json.load(file)
+            except (OSError, ValueError):
+                return None
+            # The modification time orders entries for eviction
+            os.utime(path)
+        return result
+
+    def put(self, key, result):
+        path = self._path(key)
+        with self._lock:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump(result, file)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
@@ -0,0 +1,228 @@
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+
+from compile_cache import compiler_settings
+from hook_source import analyze_hook
+
+# Text diagnostics as printed by forge, e.g.
+# Error (7576): Undeclared identifier.
+#   --> src/generated/generated_hook_0.sol:42:9:
+TEXT_DIAGNOSTIC_PATTERN = re.compile(
+    r'^(?P<severity>Error|Warning)(?: \((?P<code>\d+)\))?: (?P<message>.+?)\n\s*--> (?P<file>[^:\n]+):(?P<line>\d+):(?P<column>\d+):',
+    re.MULTILINE | re.DOTALL,
+)
+
+
+def read_solc_version(project_dir):
+    """
+    Read the pinned `solc_version` from the project's foundry.toml, or None if it is not pinned.
+    """
+    with open(os.path.join(project_dir, "foundry.toml"), 'r') as file:
+        match = re.search(r"^\s*solc_version\s*=\s*['\"]([^'\"]+)['\"]", file.read(), re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def offset_to_line_column(source, offset):
+    """
+    Convert a byte offset in a source file into 1-based line and column numbers.
+    """
+    prefix = source.encode()[:offset]
+    return prefix.count(b'\n') + 1, offset - prefix.rfind(b'\n')
+
+
+class CompileServer:
+    """
+    Long-lived compile worker for a foundry project.
+
+    Forge has no daemon mode, so the worker keeps what can be kept between builds: the
+    project's compiler cache and dependency artifacts are warmed once at start-up, the
+    pinned compiler is passed explicitly so forge skips version detection, and each build
+    only targets the generated file. Builds are serialised, since concurrent forge runs on
+    one project race on its cache. Compiler output is returned as structured diagnostics.
+    """
+
+    def __init__(self, project_dir="../foundry_hook_playground", timeout=120, warm=False, cache=None,
+                 warm_targets=(), warm_retry_interval=300):
+        """
+        :param project_dir: Root of the foundry project
+        :param timeout: Seconds after which a build is killed
+        :param warm: Whether the project cache is already warm, which skips the start-up build
+        :param cache: Optional `CompileCache`; a hit returns the stored result without running forge
+        :param warm_targets: Files or folders built by the warm-up, the whole project if empty
+        :param warm_retry_interval: Seconds before a failed warm-up is tried again
+        """
+        self.project_dir = project_dir
+        self.timeout = timeout
+        self.cache = cache
+        self.warm_targets = list(warm_targets)
+        self.warm_retry_interval = warm_retry_interval
+        self.solc_version = read_solc_version(project_dir)
+        self._lock = threading.Lock()
+        self._warm = warm
+        self._warm_failed_at = None
+
+    def _command(self, *targets):
+        # --ast keeps the AST in the artifacts, for `analyze_hook`
+        command = ["forge", "build", "--offline", "--json", "--ast"]
+        if self.solc_version:
+            command += ["--use", self.solc_version, "--no-auto-detect"]
+        return command + list(targets)
+
+    def warm_up(self):
+        """
+        Build the warm-up targets once so that dependency artifacts are cached.
+        Safe to call more than once, only the first successful call builds. After a failure,
+        calls return right away until `warm_retry_interval` has passed.
+
+        :return: Whether the project cache is warm
+        """
+        with self._lock:
+            if self._warm:
+                return True
+            if self._warm_failed_at is not None and time.monotonic() - self._warm_failed_at < self.warm_retry_interval:
+                return False
+            started = time.perf_counter()
+            try:
+                result = subprocess.run(self._command(*self.warm_targets), capture_output=True, text=True,
+                                        cwd=self.project_dir, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                print(f"\u26A0\uFE0F Compile server warm-up timed out after {self.timeout}s")
+                self._warm_failed_at = time.monotonic()
+                return False
+            if result.returncode != 0:
+                print(f"\u26A0\uFE0F Compile server warm-up failed ({result.returncode}): {result.stderr.strip()}")
+                self._warm_failed_at = time.monotonic()
+                return False
+            self._warm = True
+            print(f"Compile server warmed up in {time.perf_counter() - started:.1f}s")
+            return True
+
+    def compile(self, file_to_build):
+        """
+        Compile one generated contract.
+
+        :param file_to_build: File name inside `src/generated`
+        :return: A dictionary with `stdout`, `stderr` (the formatted errors, as forge prints
+                 them), `returncode`, `diagnostics` (see `parse_diagnostics`), `artifacts`
+                 (contract name to its `abi` and `bytecode`), `hook` (see `analyze_hook`, None
+                 if the build failed), `elapsed` seconds and `cached`. `stdout` is empty
+                 for a cached result
+        """
+        path = f"src/generated/{file_to_build}"
+        cache_key = None
+        if self.cache is not None:
+            with open(os.path.join(self.project_dir, path), 'r') as file:
+                source = file.read()
+            cache_key = self.cache.key(source, path, self._command(path), compiler_settings(self.project_dir))
+            result = self.cache.get(cache_key)
+            if result is not None:
+                return dict(result, stdout="", elapsed=0, cached=True)
+
+        self.warm_up()
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                result = subprocess.run(self._command(path), capture_output=True, text=True,
+                                        cwd=self.project_dir, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                return {
+                    'stdout': "", 'stderr': f"Compilation timed out after {self.timeout}s",
+                    'returncode': -1, 'diagnostics': [], 'artifacts': {}, 'hook': None,
+                    'elapsed': time.perf_counter() - started, 'cached': False,
+                }
+            elapsed = time.perf_counter() - started
+            artifacts, ast = self._read_artifacts(file_to_build) if result.returncode == 0 else ({}, None)
+
+        diagnostics = self.parse_diagnostics(result.stdout, result.stderr)
+        errors = [d for d in diagnostics if d['severity'] == 'error']
+        stderr = "\n".join(d['formatted'] for d in errors) or result.stderr
+        build = {
+            'stdout': result.stdout,
+            'stderr': stderr,
+            'returncode': result.returncode,
+            'diagnostics': diagnostics,
+            'artifacts': artifacts,
+            'hook': analyze_hook(ast, artifacts) if ast else None,
+        }
+        if cache_key is not None:
+            # The raw forge output is only kept for the build that produced it
+            self.cache.put(cache_key, {field: value for field, value in build.items() if field != 'stdout'})
+        return dict(build, elapsed=elapsed, cached=False)
+
+    def _read_artifacts(self, file_to_build):
+        """
+        :return: (contract name to its `abi` and `bytecode`, AST of the source unit or None)
+        """
+        artifacts = {}
+        ast = None
+        out_dir = os.path.join(self.project_dir, "out", file_to_build)
+        if not os.path.isdir(out_dir):
+            return artifacts, ast
+        for name in os.listdir(out_dir):
+            if name.endswith(".json"):
+                with open(os.path.join(out_dir, name), 'r') as file:
+                    artifact = json.load(file)
+                artifacts[name[:-len(".json")]] = {'abi': artifact["abi"], 'bytecode': artifact["bytecode"]}
+                # Every contract of the file carries the AST of the whole file
+                ast = ast or artifact.get("ast")
+        return artifacts, ast
+
+    def parse_diagnostics(self, stdout, stderr):
+        """
+        Turn compiler output into a list of diagnostics, each a dictionary with `severity`,
+        `code`, `type`, `message`, `file`, `line`, `column`, `start` and `end` (byte offsets
+        of the source range, None in text output) and `formatted`.
+
+        Reads the solc JSON `errors` printed by `forge build --json`, and falls back to
+        forge's text output when the JSON is not available.
+        """
+        try:
+            errors = json.loads(stdout).get("errors", [])
+        except (ValueError, AttributeError):
+            return self._parse_text_diagnostics(stderr + "\n" + stdout)
+
+        diagnostics = []
+        for error in errors:
+            location = error.get("sourceLocation") or {}
+            file, line, column = location.get("file"), None, None
+            if file and location.get("start", -1) >= 0:
+                try:
+                    with open(os.path.join(self.project_dir, file), 'r') as source:
+                        line, column = offset_to_line_column(source.read(), location["start"])
+                except OSError:
+                    pass
+            diagnostics.append({
+                'severity': error.get("severity", "error"),
+                'code': error.get("errorCode"),
+                'type': error.get("type"),
+                'message': error.get("message", ""),
+                'file': file,
+                'line': line,
+                'column': column,
+                'start': location.get("start"),
+                'end': location.get("end"),
+                'formatted': (error.get("formattedMessage") or error.get("message", "")).strip(),
+            })
+        return diagnostics
+
+    @staticmethod
+    def _parse_text_diagnostics(output):
+        diagnostics = []
+        for match in TEXT_DIAGNOSTIC_PATTERN.finditer(output):
+            diagnostics.append({
+                'severity': match.group('severity').lower(),
+                'code': match.group('code'),
+                'type': match.group('severity'),
+                'message': match.group('message').strip(),
+                'file': match.group('file').strip(),
+                'line': int(match.group('line')),
+                'column': int(match.group('column')),
+                'start': None,
+                'end': None,
+                'formatted': match.group(0).strip(),
+            })
+        return diagnostics
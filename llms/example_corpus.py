@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from auto_fixes import build_import_map
+
+# Cosine distance to the best match under which a file is rated high or medium
+HIGH_CONFIDENCE_MARGIN = 0.05
+MEDIUM_CONFIDENCE_MARGIN = 0.15
+
+
+def content_hash(*parts):
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+
+class ExampleCorpus:
+    """
+    In-memory index of the hook examples: every contract with its summary, token count,
+    content hash and summary embedding, looked up by file name or ranked for a prompt.
+
+    `refresh` reindexes incrementally: only files whose modification time or size changed
+    are read again, and only summaries whose hash changed are embedded. Summary vectors are
+    cached on disk by hash, so restarts cost no embedding calls. `watch` polls the examples
+    folder and the summaries file in the background; readers always see a consistent
+    snapshot, swapped in at the end of a refresh.
+    """
+
+    def __init__(self, folder, summaries_path, embed, cache_path, model, count_tokens):
+        """
+        :param folder: Folder of the example `.sol` contracts
+        :param summaries_path: JSON file mapping file names to summaries
+        :param embed: Callable turning a list of texts into a list of vectors
+        :param cache_path: `.npz` file holding the cached summary vectors
+        :param model: Name of the embedding model, part of the vector cache key
+        :param count_tokens: Callable returning the number of tokens of a text
+        """
+        self.folder = folder
+        self.summaries_path = summaries_path
+        self.embed = embed
+        self.cache_path = cache_path
+        self.model = model
+        self.count_tokens = count_tokens
+        self._refresh_lock = threading.Lock()
+        self._watch_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        # File stats of the last refresh, to skip unchanged files
+        self._stats = {}
+        self._summaries_stat = None
+        self._summaries = {}
+        self._vector_cache = None
+        # (entries by name, names of the ranked entries, normalized vectors, import map)
+        self._snapshot = ({}, [], np.zeros((0, 0), dtype=np.float32), {})
+
+    @property
+    def loaded(self):
+        """
+        Whether a refresh has succeeded.
+        """
+        return self._summaries_stat is not None
+
+    @property
+    def import_map(self):
+        """
+        Import statement for each identifier the examples import, see `build_import_map`.
+        """
+        return self._snapshot[3]
+
+    def get(self, name):
+        """
+        :return: The entry of an example, a dictionary with `name`, `code`, `summary` (or None),
+                 `tokens`, `hash` and `vector` (or None without a summary), or None if unknown
+        """
+        return self._snapshot[0].get(name)
+
+    def names(self):
+        return list(self._snapshot[0])
+
+    def refresh(self):
+        """
+        Bring the index up to date with the examples folder and the summaries file.
+
+        :return: Whether anything changed
+        """
+        with self._refresh_lock:
+            entries = self._snapshot[0]
+            changed = False
+
+            # Committed with the snapshot, so a failed refresh is retried in full
+            summaries_stat = self._stat(self.summaries_path)
+            summaries = self._summaries
+            if summaries_stat != self._summaries_stat:
+                with open(self.summaries_path, 'r') as file:
+                    summaries = json.load(file)
+
+            stats = {}
+            codes = {}
+            for file_name in sorted(os.listdir(self.folder)):
+                path = os.path.join(self.folder, file_name)
+                if not file_name.endswith(".sol") or not os.path.isfile(path):
+                    continue
+                stats[file_name] = self._stat(path)
+                if file_name in entries and stats[file_name] == self._stats.get(file_name):
+                    codes[file_name] = entries[file_name]['code']
+                else:
+                    with open(path, 'r') as file:
+                        codes[file_name] = file.read()
+
+            new_entries = {}
+            to_embed = {}
+            for file_name, code in codes.items():
+                summary = summaries.get(file_name)
+                entry = entries.get(file_name)
+                code_hash = content_hash(code)
+                if entry is None or entry['hash'] != code_hash or entry['summary'] != summary:
+                    changed = True
+                    entry = {
+                        'name': file_name,
+                        'code': code,
+                        'summary': summary,
+                        'tokens': entry['tokens'] if entry and entry['hash'] == code_hash else self.count_tokens(code),
+                        'hash': code_hash,
+                        'vector': None,
+                    }
+                    if summary is not None:
+                        to_embed[file_name] = summary
+                new_entries[file_name] = entry
+            changed = changed or set(new_entries) != set(entries)
+            if not changed:
+                self._commit(stats, summaries, summaries_stat)
+                return False
+
+            self._embed_summaries(new_entries, to_embed)
+            import_map = build_import_map(codes.values())
+            names = [name for name, entry in new_entries.items() if entry['vector'] is not None]
+            vectors = np.asarray([new_entries[name]['vector'] for name in names], dtype=np.float32)
+            if len(names):
+                vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+            self._snapshot = (new_entries, names, vectors, import_map)
+            self._commit(stats, summaries, summaries_stat)
+            print(f"\U0001F4DA Example corpus indexed: {len(new_entries)} examples, {len(to_embed)} summaries embedded or reloaded")
+            return True
+
+    def _commit(self, stats, summaries, summaries_stat):
+        self._stats = stats
+        self._summaries = summaries
+        self._summaries_stat = summaries_stat
+
+    def watch(self, interval=5.0):
+        """
+        Refresh the index every `interval` seconds in a daemon thread, until `stop`.
+        """
+        with self._watch_lock:
+            if self._watcher is not None:
+                return
+            self._stop.clear()
+
+            def poll():
+                while not self._stop.wait(interval):
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        # A file caught mid-write or a failed embedding call, the next poll retries
+                        print(f"\u26A0\uFE0F Example corpus refresh failed: {e}")
+
+            self._watcher = threading.Thread(target=poll, name="example-corpus", daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def scores(self, query):
+        """
+        :param query: Embedding of the prompt
+        :return: (names of the examples with a summary, cosine similarity of the prompt with each)
+        """
+        _, names, vectors, _ = self._snapshot
+        query = np.asarray(query, dtype=np.float32)
+        return names, vectors @ (query / np.linalg.norm(query))
+
+    def top_k(self, prompt, k=5):
+        """
+        Rank the examples for a prompt.
+
+        :return: A list of (file name, "high"/"medium"/"low", score), best first
+        """
+        return self.rank(self.embed([prompt])[0], k)
+
+    def rank(self, query, k=5):
+        """
+        Rank the examples for an already embedded prompt, see `top_k`.
+        """
+        names, scores = self.scores(query)
+        if not names:
+            return []
+        best = np.argsort(-scores)[:k]
+        top_score = scores[best[0]]
+        ranked = []
+        for i in best:
+            if scores[i] >= top_score - HIGH_CONFIDENCE_MARGIN:
+                confidence = "high"
+            elif scores[i] >= top_score - MEDIUM_CONFIDENCE_MARGIN:
+                confidence = "medium"
+            else:
+                confidence = "low"
+            ranked.append((names[i], confidence, float(scores[i])))
+        return ranked
+
+    def _embed_summaries(self, entries, summaries):
+        """
+        Set the vector of the given entries, from the disk cache or with one embedding call.
+        """
+        if self._vector_cache is None:
+            self._vector_cache = {}
+            if os.path.isfile(self.cache_path):
+                try:
+                    cached = np.load(self.cache_path)
+                    self._vector_cache = dict(zip(cached["keys"].tolist(), cached["vectors"]))
+                except (OSError, KeyError, ValueError):
+                    pass
+        keys = {name: content_hash(self.model, summary) for name, summary in summaries.items()}
+        missing = [name for name in summaries if keys[name] not in self._vector_cache]
+        if missing:
+            vectors = self.embed([summaries[name] for name in missing])
+            for name, vector in zip(missing, vectors):
+                self._vector_cache[keys[name]] = np.asarray(vector, dtype=np.float32)
+            # Only the vectors of current summaries are kept on disk
+            current = {content_hash(self.model, entry['summary']) for entry in entries.values() if entry['summary'] is not None}
+            cache_keys = [key for key in self._vector_cache if key in current]
+            self._vector_cache = {key: self._vector_cache[key] for key in cache_keys}
+            np.savez(self.cache_path, keys=np.asarray(cache_keys), vectors=np.asarray([self._vector_cache[key] for key in cache_keys]))
+        for name in summaries:
+            entries[name]['vector'] = self._vector_cache[keys[name]]
+
+    @staticmethod
+    def _stat(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
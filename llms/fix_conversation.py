@@ -0,0 +1,139 @@
+import difflib
+
+from functions import get_n_tokens
+
+# Distinct compiler errors listed for one attempt, further ones are only counted
+MAX_ERRORS_PER_ATTEMPT = 5
+# Lines of raw compiler output kept when no structured diagnostics are available
+MAX_STDERR_LINES = 40
+
+FULL, DIFF, SUMMARY = 0, 1, 2
+
+
+def error_key(diagnostic):
+    # Line numbers move between attempts, the same code and message is the same error
+    return diagnostic['code'], diagnostic['message']
+
+
+def relevant_errors(diagnostics):
+    """
+    Keep the errors of a build, without warnings and without duplicates.
+    """
+    errors = []
+    seen = set()
+    for diagnostic in diagnostics:
+        if diagnostic['severity'] != 'error':
+            continue
+        key = (error_key(diagnostic), diagnostic['line'])
+        if key not in seen:
+            seen.add(key)
+            errors.append(diagnostic)
+    return errors
+
+
+def compact_error(diagnostic):
+    location = f"line {diagnostic['line']}: " if diagnostic['line'] else ""
+    code = f" ({diagnostic['code']})" if diagnostic['code'] else ""
+    return f"{location}{diagnostic['type'] or 'Error'}{code}: {diagnostic['message']}"
+
+
+class FixConversation:
+    """
+    Conversation of the generate/compile-fix rounds, kept under a token budget.
+
+    Every failed attempt is stored once, and the history sent to the LLM is rebuilt for
+    each round. The latest attempt is sent in full with its errors; compiler output is cut
+    down to distinct errors, and errors already reported for the previous attempt are only
+    listed by message. When the history exceeds the budget, older attempts are collapsed
+    into the diff the next attempt applied to them, then into a one-line summary, and
+    finally dropped, oldest first.
+    """
+
+    def __init__(self, prompt, budget, count_tokens=get_n_tokens):
+        """
+        :param prompt: The user's hook request, the first message of the conversation
+        :param budget: Maximum number of tokens of the history and the new prompt
+        :param count_tokens: Callable returning the number of tokens of a text
+        """
+        self.prompt = prompt
+        self.budget = budget
+        self.count_tokens = count_tokens
+        self.attempts = []
+
+    def add_attempt(self, code, build):
+        """
+        Record a failed attempt.
+
+        :param code: The Solidity source that was compiled
+        :param build: The compile result, see `CompileServer.compile`
+        """
+        errors = relevant_errors(build["diagnostics"])
+        stderr_lines = [line for line in build["stderr"].splitlines() if line.strip()]
+        self.attempts.append({
+            'code': code,
+            'errors': errors,
+            'stderr': "\n".join(stderr_lines[:MAX_STDERR_LINES]),
+        })
+
+    def conversation(self):
+        """
+        Build the messages for the next round.
+
+        :return: (conversation history, new prompt), as taken by `stream_claude_answer`
+        """
+        levels = [FULL] * len(self.attempts)
+        first = 0
+        while True:
+            messages = self._messages(levels, first)
+            if sum(self.count_tokens(message["content"]) for message in messages) <= self.budget:
+                break
+            collapsible = [i for i in range(first, len(self.attempts) - 1) if levels[i] < SUMMARY]
+            if collapsible:
+                # All older attempts become diffs before any becomes a summary
+                levels[min(collapsible, key=lambda i: (levels[i], i))] += 1
+            elif first < len(self.attempts) - 1:
+                first += 1
+            else:
+                # Only the latest attempt is left, it is needed in full
+                break
+        return messages[:-1], messages[-1]["content"]
+
+    def _messages(self, levels, first):
+        messages = [{"role": "user", "content": self.prompt}]
+        for i in range(first, len(self.attempts)):
+            messages.append({"role": "assistant", "content": self._render_code(i, levels[i])})
+            messages.append({"role": "user", "content": self._render_errors(i, levels[i])})
+        return messages
+
+    def _render_code(self, index, level):
+        attempt = self.attempts[index]
+        lines = attempt['code'].splitlines()
+        if level == DIFF:
+            following = self.attempts[index + 1]['code'].splitlines()
+            diff = list(difflib.unified_diff(lines, following, n=1, lineterm=""))[2:]
+            # A rewrite is cheaper to summarise than to diff
+            if len(diff) < len(lines) // 2:
+                return f"[Attempt {index + 1} omitted, the next attempt changed it as follows:]\n" + "\n".join(diff)
+        if level != FULL:
+            return f"[Attempt {index + 1} omitted: {len(lines)} lines of Solidity that did not compile.]"
+        return attempt['code']
+
+    def _render_errors(self, index, level):
+        attempt = self.attempts[index]
+        if not attempt['errors']:
+            errors = attempt['stderr']
+        else:
+            reported = set()
+            if index > 0:
+                reported = {error_key(error) for error in self.attempts[index - 1]['errors']}
+            rendered = []
+            for error in attempt['errors'][:MAX_ERRORS_PER_ATTEMPT]:
+                if level != FULL or error_key(error) in reported:
+                    rendered.append(compact_error(error) + (" (reported before)" if error_key(error) in reported else ""))
+                else:
+                    rendered.append(error['formatted'])
+            omitted = len(attempt['errors']) - MAX_ERRORS_PER_ATTEMPT
+            if omitted > 0:
+                rendered.append(f"... and {omitted} more errors")
+            errors = "\n\n".join(rendered)
+        return "I get this error when compiling the contract: \n\n"+errors+"\n\nOUTPUT: Only the fixed solidity code"
@@ -1,84 +1,49 @@
-import json
+import hashlib
 import os
-import random
-import subprocess
-import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
 
-from anthropic import Anthropic
 from dotenv import load_dotenv, find_dotenv
-from IPython.display import display, Markdown
-from openai import OpenAI
-import tiktoken
 
 load_dotenv(find_dotenv())
 
-OpenAI_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-Anthropic_client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-
+import async_llm
 
-def extract_contract_name(text):
-    """
-    Extracts the contract code from a given string that matches the pattern 'contract xxxx is'.
 
-    Args:
-        text (str): The input string containing the contract information.
+def get_embeddings(texts, model="text-embedding-3-small"):
+    return async_llm.run(async_llm.embed(texts, model))
 
-    Returns:
-        str: The extracted contract code if found, otherwise None.
+@lru_cache(maxsize=None)
+def get_encoding(model="gpt-4o"):
     """
-    # Regex pattern
-    pattern = r"contract\s(\w+)\sis"
-    
-    # Search for the pattern
-    match = re.search(pattern, text)
-    
-    if match:
-        # Extract the captured group
-        return match.group(1)
-    else:
-        return None
-    
-def get_n_tokens(text):
-    enc = tiktoken.encoding_for_model("gpt-4o")
-    return len(enc.encode(text))
+    The tokenizer of a model, loaded once. tiktoken is imported here, off the import path.
+    """
+    import tiktoken
+    return tiktoken.encoding_for_model(model)
 
-def get_openai_answer(instructions, conversation_history, new_prompt, json_output=False):
-    if len(conversation_history)==0:
-        conversation_history.append({"role": "system", "content": instructions})
-    conversation_history.append({"role": "user", "content": new_prompt})
+def get_n_tokens(text):
+    return len(get_encoding().encode(text))
 
-    if json_output:
-        completion = OpenAI_client.chat.completions.create(
-          model="gpt-4o",
-          messages=conversation_history,
-          response_format={"type": "json_object"}
-        )
-    else:
-        completion = OpenAI_client.chat.completions.create(
-          model="gpt-4o",
-          messages=conversation_history
-        )
+# The helpers below are synchronous wrappers around `async_llm`, which owns pooled
+# clients with timeouts and jittered retries on a shared event loop
 
-    conversation_history.append({"role": "assistant", "content": completion.choices[0].message.content})
-    
-    return completion.choices[0].message.content, conversation_history
+def stream_claude_answer(instructions, conversation_history, new_prompt, usage=None, temperature=None):
+    """
+    Yields the Claude answer as text chunks while it is generated.
+    The full answer is appended to `conversation_history` once the stream ends.
+    """
+    yield from async_llm.iterate(async_llm.claude_stream(instructions, conversation_history, new_prompt,
+                                                         usage=usage, temperature=temperature))
 
 
-def get_claude_answer(instructions, conversation_history, new_prompt):
-    conversation_history.append({"role": "user", "content": new_prompt})
-        
-    # Call the Claude API with the updated conversation history
-    message = Anthropic_client.messages.create(
-        max_tokens=2000,
-        system=instructions,
-        messages=conversation_history,
-        model="claude-3-5-sonnet-20240620",
-    )
-    
-    # Append the Claude's response to the conversation history
-    conversation_history.append({"role": "assistant", "content": message.content[0].text})
-    
-    return message.content[0].text, conversation_history
+def stream_openai_answer(instructions, conversation_history, new_prompt, usage=None, temperature=None):
+    """
+    Same as `stream_claude_answer`, with OpenAI. `conversation_history` holds no system message.
+    """
+    yield from async_llm.iterate(async_llm.openai_stream(instructions, conversation_history, new_prompt,
+                                                         usage=usage, temperature=temperature))
 
 
 def read_file(file_path):
@@ -89,33 +54,11 @@ def read_file(file_path):
     except FileNotFoundError:
         return "File not found."
 
-def read_all_files_in_folder(folder_path):
-    contents_dict = {}
-    for filename in os.listdir(folder_path):
-        if filename[-4:] == ".sol":
-            file_path = os.path.join(folder_path, filename)
-            if os.path.isfile(file_path):
-                with open(file_path, 'r') as file:
-                    contents = file.read()
-                    contents_dict[filename] = contents
-    return contents_dict
-
-def get_cost_dollars(instructions, answer):
-    input_1k_tokens = 0.005
-    output_1k_tokens = 0.015
-    return input_1k_tokens * get_n_tokens(instructions)/1000 + output_1k_tokens * get_n_tokens(answer)/1000
-
-def render_markdown(text):
-    display(Markdown(text))
-
-def sample_dict(dictionary, sample_size):
-    if sample_size > len(dictionary):
-        raise ValueError("Sample size cannot be larger than the dictionary size")
-    
-    sampled_keys = random.sample(list(dictionary.keys()), sample_size)
-    sampled_dict = {key: dictionary[key] for key in sampled_keys}
-    
-    return sampled_dict
+def generated_file_name(source):
+    """
+    Name a generated contract after its content, so identical sources share a compile cache entry.
+    """
+    return f"generated_{hashlib.sha256(source.encode()).hexdigest()[:16]}.sol"
 
 def save_to_sol(content, folder_path, file_name):
     # Ensure the file has the .sol extension
@@ -132,140 +75,101 @@ def save_to_sol(content, folder_path, file_name):
     #print(f"File {file_path} has been created and saved successfully.")
 
 
-def compile_contract(file_to_build):
-
-    command = f"forge build --contracts src/generated/{file_to_build}"
-    working_directory = "../foundry_hook_playground"
-
-    # Run the command in the specified directory
-    result = subprocess.run(command, shell=True, capture_output=True, text=True, cwd=working_directory)
-
-    # Return stdout, stderr, and returncode
-    return result.stdout, result.stderr, result.returncode
-
-
-def markdown_to_text(text):
-    spdx_str = "// SPDX-License-Identifier"
-    index = text.find(spdx_str)
-    if index != -1:
-        # Strip leading and trailing whitespace, then remove trailing backticks
-        return text[index:].strip().rstrip('`')
-    else:
-        # If the SPDX string is not found, strip whitespace and remove trailing backticks
-        return text.strip().rstrip('`')
-        
-
-def remove_last_brace(text):
+class RateLimited(Exception):
     """
-    Remove the last occurrence of '}' in the text.
-    
-    :param text: The input string
-    :return: A string with the last '}' removed
+    Raised by `admission_control` when a call is rejected. `retry_after` is the number of
+    seconds the client should wait before trying again.
     """
-    last_brace_index = text.rfind('}')
-    
-    if last_brace_index != -1:
-        # Return the string with the last '}' removed
-        return text[:last_brace_index] + text[last_brace_index + 1:]
-    else:
-        # Return the original text if no '}' is found
-        return text
-    
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
 
-def n_arguments_in_constructor(text):
-    """
-    Count the number of commas between the parentheses after the constructor in the given text.
-    
-    :param text: The input string containing the constructor
-    :return: The number of commas in the constructor's parameter list, or 0 if the list is empty or only contains spaces
-    """
-    # Regular expression to match the constructor parameters
-    pattern = r'constructor\s*\(([^)]*)\)'
-    match = re.search(pattern, text)
-    
-    if match:
-        # Extract the parameters string
-        params = match.group(1).strip()
-        # Check if the parameters string is empty or only contains spaces
-        if not params:
-            return 0
-        # Count the commas in the parameters string
-        comma_count = params.count(',')
-        return comma_count+1
-    else:
-        return 0
-    
 
-def multiply_string_with_commas(string, x):
+class TokenBuckets:
     """
-    Multiply a string x times with commas in between.
-    
-    :param string: The input string to be multiplied
-    :param x: The number of times to multiply the string
-    :return: A new string with the input string repeated x times, separated by commas
+    Token buckets keyed by client. Each client may burst `capacity` calls, refilled at
+    `rate` calls per second. The least recently seen clients are forgotten past `max_clients`.
     """
-    if x <= 0:
-        return ""
-    
-    return ','.join([string] * x)
+    def __init__(self, rate, capacity, max_clients=10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
 
+    def take(self, client):
+        """
+        Take one token for `client`.
 
-def remove_triple_backtick(text):
-    """
-    Remove all occurrences of triple backtick ``` from the text.
-    
-    :param text: The input text
-    :return: The text with all occurrences of triple backtick removed
-    """
-    return text.replace("```", "")
+        :return: 0 if a token was taken, otherwise the seconds until one is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return wait
 
 
-import time
-from functools import wraps
-
-def rate_limit(min_interval):
+def admission_control(key_func, rate, burst, max_concurrent, max_queue, queue_timeout):
     """
-    Decorator to prevent a function from being called again before a specified interval has passed.
-    
-    :param min_interval: The minimum interval (in seconds) that must pass before the function can be called again
+    Decorator for expensive endpoints: a token bucket per client, at most `max_concurrent`
+    calls running at once and at most `max_queue` calls waiting for a slot. Rejected calls
+    raise `RateLimited`. Functions decorated with the same decorator share the buckets and
+    the slots.
+
+    If the function returns a streamed response (anything with `is_streamed` and
+    `call_on_close`), the slot is held until the stream is closed.
+
+    :param key_func: Called with the function arguments, returns the client key
+    :param rate: Calls per second refilled in each client bucket
+    :param burst: Bucket capacity
+    :param max_concurrent: Number of calls allowed to run at the same time
+    :param max_queue: Number of calls allowed to wait for a slot
+    :param queue_timeout: Seconds a call waits for a slot before being rejected
     """
-    def decorator(func):
-        last_called = [0]  # Using a list to allow modification of the timestamp
+    # Shared by every function decorated with the returned decorator
+    buckets = TokenBuckets(rate, burst)
+    slots = threading.BoundedSemaphore(max_concurrent)
+    waiting = [0]
+    waiting_lock = threading.Lock()
 
+    def decorator(func):
         @wraps(func)
         def wrapped(*args, **kwargs):
-            current_time = time.time()
-            elapsed_time = current_time - last_called[0]
-
-            if elapsed_time < min_interval:
-                raise Exception(f"Function called too soon. Please wait {min_interval - elapsed_time:.2f} more seconds.")
-
-            result = func(*args, **kwargs)
-            last_called[0] = current_time
+            wait = buckets.take(key_func(*args, **kwargs))
+            if wait:
+                raise RateLimited(f"Too many requests. Please wait {wait:.2f} more seconds.", wait)
+
+            with waiting_lock:
+                if waiting[0] >= max_queue:
+                    raise RateLimited("Server busy, admission queue is full.", queue_timeout)
+                waiting[0] += 1
+            try:
+                admitted = slots.acquire(timeout=queue_timeout)
+            finally:
+                with waiting_lock:
+                    waiting[0] -= 1
+            if not admitted:
+                raise RateLimited("Server busy, timed out waiting for a free slot.", queue_timeout)
+
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                slots.release()
+                raise
+            if getattr(result, "is_streamed", False) and hasattr(result, "call_on_close"):
+                result.call_on_close(slots.release)
+            else:
+                slots.release()
             return result
 
         return wrapped
     return decorator
-
-
-def write_to_file(filename, text):
-    """
-    Write the given text to a file, overwriting any existing content.
-    
-    :param filename: The name of the file to write to
-    :param text: The text to write to the file
-    """
-    with open(filename, 'w') as file:
-        file.write(text)
-
-
-def read_from_file(filename):
-    """
-    Read the content of a file and return it.
-    
-    :param filename: The name of the file to read from
-    :return: The content of the file as a string
-    """
-    with open(filename, 'r') as file:
-        content = file.read()
-    return content
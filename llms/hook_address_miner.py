@@ -39,20 +39,6 @@ FLAGS = {
     'afterRemoveLiquidityReturnDelta': AFTER_REMOVE_LIQUIDITY_RETURNS_DELTA_FLAG,
 }
 
-def extract_flags_from_code(code):
-    """
-    Extract flag values from Solidity code using regex.
-    
-    :param code: The Solidity code as a string
-    :return: A dictionary representing the state of each flag (true or false)
-    """
-    flag_states = {}
-    pattern = re.compile(r'(\w+):\s*(true|false)', re.IGNORECASE)
-    matches = pattern.findall(code)
-    for flag, state in matches:
-        flag_states[flag] = state.lower() == 'true'
-    return flag_states
-
 def calculate_flags(flag_states):
     """
     Calculate the combined flags based on the provided flag states.
@@ -67,17 +53,293 @@ def calculate_flags(flag_states):
     return combined_flags
 
 
+import atexit
+import itertools
+import multiprocessing
+import os
+import struct
+import threading
+import time
+
+from Crypto.Hash import keccak as keccak256
 from web3 import Web3
+from eth_abi import encode
 from eth_utils import keccak, to_bytes
-from eth_account import Account
 
 # Mask to slice out the top 10 bits of the address
 FLAG_MASK = 0x3FF << 146
 
-# Maximum number of iterations to find a salt, avoid infinite loops
-MAX_LOOP = 200000
+# Mask for the hook permission flags encoded in the least significant bits of the address
+ALL_HOOK_MASK = (1 << 14) - 1
+
+# Number of salts hashed by a worker before reporting back. Batches are aligned to this
+# size (a power of two), so the upper 24 bytes of the salt are constant inside a batch
+DEFAULT_BATCH_SIZE = 1 << 14
+
+# Layout of the CREATE2 preimage: 0xff ++ deployer (20) ++ salt (32) ++ keccak(init code) (32)
+PREIMAGE_LENGTH = 85
+_SALT_OFFSET = 21
+_SALT_LOW_OFFSET = _SALT_OFFSET + 24
+_CODE_HASH_OFFSET = _SALT_OFFSET + 32
+
+# Mining processes come from a fork server: forking the multithreaded app process could
+# leave a child holding a lock another thread had taken
+_mp_context = multiprocessing.get_context("forkserver")
+_mp_context.set_forkserver_preload(["hook_address_miner"])
+_pool = None
+_pool_lock = threading.Lock()
+
+# Preimage buffers reused across batches, one per (deployer, init code hash) in each process
+_preimage_buffers = {}
+
+
+class MiningCancelled(Exception):
+    """
+    Raised by `mine` when its `should_stop` callback asks for the search to end.
+    """
+
+
+def build_preimage(deployer_bytes: bytes, init_code_hash: bytes) -> bytearray:
+    """
+    Build a CREATE2 preimage with the salt slot zeroed.
+
+    :param deployer_bytes: The 20 address bytes of the deployer
+    :param init_code_hash: keccak256 of the creation code with its encoded constructor arguments
+    :return: An 85-byte buffer `0xff ++ deployer ++ salt ++ init_code_hash`
+    """
+    buffer = bytearray(PREIMAGE_LENGTH)
+    buffer[0] = 0xff
+    buffer[1:_SALT_OFFSET] = deployer_bytes
+    buffer[_CODE_HASH_OFFSET:] = init_code_hash
+    return buffer
+
+
+def _scan_batch(job):
+    """
+    Hash a contiguous, batch-aligned range of salts, stopping once every wanted flag
+    combination has been produced.
+
+    Every flag combination met on the way is recorded with the first salt producing it,
+    so a single pass can answer later requests for other flags.
+
+    :param job: A tuple (deployer_bytes, init_code_hash, wanted flags as a frozenset, start, count)
+    :return: A tuple (number of salts hashed, {flags: first salt})
+    """
+    deployer_bytes, init_code_hash, wanted, start, count = job
+    key = (deployer_bytes, init_code_hash)
+    buffer = _preimage_buffers.get(key)
+    if buffer is None:
+        buffer = _preimage_buffers[key] = build_preimage(deployer_bytes, init_code_hash)
+    buffer[_SALT_OFFSET:_SALT_LOW_OFFSET] = (start >> 64).to_bytes(24, 'big')
+
+    seen = {}
+    remaining = len(wanted)
+    pack_low = struct.Struct('>Q').pack_into
+    new = keccak256.new
+    low_mask = (1 << 64) - 1
+
+    for salt in range(start, start + count):
+        pack_low(buffer, _SALT_LOW_OFFSET, salt & low_mask)
+        digest = new(digest_bits=256, data=buffer).digest()
+        address_flags = ((digest[30] & 0x3F) << 8) | digest[31]
+        if address_flags not in seen:
+            seen[address_flags] = salt
+            if address_flags in wanted:
+                remaining -= 1
+                if not remaining:
+                    return salt - start + 1, seen
+    return count, seen
+
+
+def _batches(deployer_bytes: bytes, init_code_hash: bytes, wanted: frozenset,
+             seed: int, limit: int, batch_size: int):
+    """
+    Yield `_scan_batch` jobs covering [seed, limit). The first batch may be partial so that
+    the following ones stay aligned to `batch_size`.
+    """
+    cursor = seed
+    while cursor < limit:
+        end = min((cursor // batch_size + 1) * batch_size, limit)
+        yield deployer_bytes, init_code_hash, wanted, cursor, end - cursor
+        cursor = end
+
+
+def _check_mining_args(flags, batch_size: int):
+    for flag_set in flags:
+        if flag_set & ~ALL_HOOK_MASK:
+            raise ValueError("Flags must fit in the 14 least significant bits")
+    if batch_size <= 0 or batch_size & (batch_size - 1):
+        raise ValueError("Batch size must be a power of two")
+
+
+def _run_batches(jobs, workers: int):
+    """
+    Hash a list of batch jobs, in-process for a single worker or on the shared pool.
+    Results are yielded in job order as soon as each one is available.
+    """
+    if workers == 1:
+        return map(_scan_batch, jobs)
+    return _get_pool().imap(_scan_batch, jobs, chunksize=1)
+
+
+def _get_pool():
+    """
+    Return the shared mining process pool, one process per CPU. It is created on first use
+    and never replaced, since other threads may be iterating over its results.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _mp_context.Pool(os.cpu_count() or 1)
+        return _pool
+
+
+@atexit.register
+def _close_pool():
+    if _pool is not None:
+        _pool.terminate()
+
+
+def _stats(salts_tried: int, started: float):
+    elapsed = time.perf_counter() - started
+    return {
+        'salts_tried': salts_tried,
+        'elapsed': elapsed,
+        'hashes_per_sec': salts_tried / elapsed if elapsed > 0 else float('inf'),
+    }
+
+
+def mine(deployer: str, flags: int, seed: int, init_code_hash: bytes,
+         workers: int = None, batch_size: int = DEFAULT_BATCH_SIZE, max_salts: int = None,
+         progress=None, should_stop=None):
+    """
+    Search salts upward from `seed` until the CREATE2 address carries exactly `flags`.
+
+    Salts are hashed in batches of `batch_size` spread over a process pool. Results are
+    consumed in batch order, so the returned salt is always the lowest match, whatever the
+    number of workers.
+
+    :param deployer: The address that will deploy the hook
+    :param flags: The desired flags for the hook address
+    :param seed: The first salt to try
+    :param init_code_hash: keccak256 of the creation code with its encoded constructor arguments
+    :param workers: Sizes the rounds of batches sent to the shared pool of one process per CPU.
+                    Defaults to the number of CPUs; 1 mines in-process
+    :param batch_size: Number of salts per batch, must be a power of two
+    :param max_salts: Optional cap on the number of salts to try
+    :param progress: Optional callback receiving the number of salts tried after each batch
+    :param should_stop: Optional callable checked after each batch; when it returns True the
+                        search ends with `MiningCancelled`
+    :return: A dictionary with the `salt` found, `salts_tried`, `elapsed` seconds, `hashes_per_sec`
+             and `seen`, the first salt for every flag combination met in [seed, seed + salts_tried)
+    """
+    _check_mining_args([flags], batch_size)
+
+    workers = workers or os.cpu_count() or 1
+    limit = 1 << 256 if max_salts is None else min(1 << 256, seed + max_salts)
+    pending = _batches(to_bytes(hexstr=deployer), init_code_hash, frozenset([flags]),
+                       seed, limit, batch_size)
+    salts_tried = 0
+    seen = {}
+    started = time.perf_counter()
+
+    while flags not in seen:
+        round_jobs = list(itertools.islice(pending, workers * 2))
+        if not round_jobs:
+            raise Exception('HookMiner: could not find salt')
+        for hashed, batch_seen in _run_batches(round_jobs, workers):
+            salts_tried += hashed
+            for address_flags, first_salt in batch_seen.items():
+                seen.setdefault(address_flags, first_salt)
+            if progress is not None:
+                progress(salts_tried)
+            if flags in seen:
+                break
+            if should_stop is not None and should_stop():
+                raise MiningCancelled(f'HookMiner: cancelled after {salts_tried} salts')
+
+    return {'salt': seen[flags], 'seen': seen, **_stats(salts_tried, started)}
+
+
+def find_many(jobs, workers: int = None, index=None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Find salts for many hooks in one parallel sweep, yielding each result as soon as it is known.
+
+    Jobs sharing a deployer, init code and seed are mined by a single pass that stops once
+    all of their flags have been met. Every round hands each unresolved pass the same number
+    of batches on the shared pool, so cheap jobs resolve early and are streamed back while
+    the expensive ones keep mining. Each salt is the one `find` would return for the same job.
+
+    :param jobs: An iterable of (deployer, flags, seed, creation_code, constructor_args) tuples,
+                 with the same meaning as the arguments of `find`
+    :param workers: See `mine`
+    :param index: Optional `SaltIndex` consulted before mining and updated after each pass
+    :param batch_size: Number of salts per batch, must be a power of two
+    :return: A generator of (job position, hook address, salt) tuples, in resolution order
+    """
+    workers = workers or os.cpu_count() or 1
+    passes = {}
+    for position, (deployer, flags, seed, creation_code, constructor_args) in enumerate(jobs):
+        _check_mining_args([flags], batch_size)
+        creation_code_with_args = creation_code + constructor_args
+        init_code_hash = keccak(creation_code_with_args)
+        if index is not None:
+            salt, seed = index.lookup(deployer, init_code_hash, flags, seed)
+            if salt is not None:
+                yield position, compute_address(deployer, salt, creation_code_with_args), Web3.to_hex(salt)
+                continue
+        mining_pass = passes.setdefault((deployer.lower(), init_code_hash, seed), {
+            'deployer': deployer,
+            'creation_code': creation_code_with_args,
+            'waiting': {},
+            'seen': {},
+            'salts_tried': 0,
+        })
+        mining_pass['waiting'].setdefault(flags, []).append(position)
+
+    started = time.perf_counter()
+    for (_, init_code_hash, seed), mining_pass in passes.items():
+        mining_pass['pending'] = _batches(to_bytes(hexstr=mining_pass['deployer']), init_code_hash,
+                                          frozenset(mining_pass['waiting']), seed, 1 << 256, batch_size)
+
+    batches_per_pass = max(1, workers * 2 // max(1, len(passes)))
+    while passes:
+        round_jobs = []
+        owners = []
+        for key, mining_pass in passes.items():
+            batches = list(itertools.islice(mining_pass['pending'], batches_per_pass))
+            if not batches:
+                raise Exception('HookMiner: could not find salt')
+            round_jobs.extend(batches)
+            owners.extend([key] * len(batches))
+
+        for key, (hashed, batch_seen) in zip(owners, _run_batches(round_jobs, workers)):
+            mining_pass = passes.get(key)
+            if mining_pass is None:
+                continue
+            mining_pass['salts_tried'] += hashed
+            seen = mining_pass['seen']
+            for address_flags, first_salt in batch_seen.items():
+                seen.setdefault(address_flags, first_salt)
+
+            for flags in [flags for flags in mining_pass['waiting'] if flags in seen]:
+                address = compute_address(mining_pass['deployer'], seen[flags], mining_pass['creation_code'])
+                for position in mining_pass['waiting'].pop(flags):
+                    yield position, address, Web3.to_hex(seen[flags])
 
-def find(deployer: str, flags: int, seed: int, creation_code: bytes, constructor_args: bytes):
+            if not mining_pass['waiting']:
+                # Remaining batches of a finished pass in this round are skipped above
+                del passes[key]
+                _, init_code_hash, seed = key
+                result = {'seen': seen, **_stats(mining_pass['salts_tried'], started)}
+                print(f"HookMiner: {result['salts_tried']} salts in {result['elapsed']:.3f}s "
+                      f"({result['hashes_per_sec']:,.0f} hashes/sec)")
+                if index is not None:
+                    index.record(mining_pass['deployer'], init_code_hash, seed, result)
+
+
+def find(deployer: str, flags: int, seed: int, creation_code: bytes, constructor_args: bytes,
+         workers: int = None, index=None, progress=None, should_stop=None):
     """
     Find a salt that produces a hook address with the desired `flags`
 
@@ -89,18 +351,79 @@ def find(deployer: str, flags: int, seed: int, creation_code: bytes, constructor
                  Useful for finding salts for multiple hooks with the same flags
     :param creation_code: The creation code of a hook contract. Example: `type(Counter).creationCode`
     :param constructor_args: The encoded constructor arguments of a hook contract. Example: `abi.encode(address(manager))`
+    :param workers: See `mine`
+    :param index: Optional `SaltIndex` answering known flag combinations without hashing,
+                  and recording every combination met by the mining pass
+    :param progress: Optional callback receiving the number of salts tried, see `mine`
+    :param should_stop: Optional cancellation check, see `mine`
     :return: A tuple containing the hook address and the salt that was found.
              The salt can be used in `new Hook{salt: salt}(<constructor arguments>)`
     """
     creation_code_with_args = creation_code + constructor_args
+    init_code_hash = keccak(creation_code_with_args)
+
+    if index is not None:
+        salt, seed = index.lookup(deployer, init_code_hash, flags, seed)
+        if salt is not None:
+            print("HookMiner: salt served from index")
+            return compute_address(deployer, salt, creation_code_with_args), Web3.to_hex(salt)
+
+    result = mine(deployer, flags, seed, init_code_hash, workers=workers,
+                  progress=progress, should_stop=should_stop)
+    print(f"HookMiner: {result['salts_tried']} salts in {result['elapsed']:.3f}s "
+          f"({result['hashes_per_sec']:,.0f} hashes/sec)")
+    if index is not None:
+        index.record(deployer, init_code_hash, seed, result)
+
+    salt = result['salt']
+    return compute_address(deployer, salt, creation_code_with_args), Web3.to_hex(salt)
 
-    for salt in range(seed, MAX_LOOP):
-        hook_address = compute_address(deployer, salt, creation_code_with_args)
-        #print(ethereum_address_to_binary_and_top_10(hook_address)[1], flags)
-        if ethereum_address_to_binary_and_least_14_bits(hook_address)[1] == flags:
-            return hook_address, Web3.to_hex(salt)
+def _split_tuple(abi_type: str) -> list:
+    """
+    Split a tuple type such as `(uint256,(address,bool))` into its component types.
+    """
+    components, depth, start = [], 0, 1
+    for i, char in enumerate(abi_type[1:-1], start=1):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            components.append(abi_type[start:i])
+            start = i + 1
+    if start < len(abi_type) - 1:
+        components.append(abi_type[start:-1])
+    return components
+
+def _abi_value(abi_type: str, value):
+    """
+    Convert a JSON value into what `eth_abi` expects for `abi_type`.
+    """
+    array = re.match(r'^(.*)\[(\d*)\]$', abi_type)
+    if array:
+        return [_abi_value(array.group(1), item) for item in value]
+    if abi_type.startswith("("):
+        return tuple(_abi_value(component, item) for component, item in zip(_split_tuple(abi_type), value))
+    if abi_type.startswith(("uint", "int")):
+        return int(value, 0) if isinstance(value, str) else int(value)
+    if abi_type.startswith("bytes"):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value) if isinstance(value, str) else bytes(value)
+    if abi_type == "address":
+        return Web3.to_checksum_address(value)
+    return value
 
-    raise Exception('HookMiner: could not find salt')
+def encode_constructor_args(constructor_types: list, values: list) -> bytes:
+    """
+    ABI-encode constructor arguments, as `abi.encode(...)` does, to append to the creation code.
+
+    :param constructor_types: Canonical ABI types of the constructor parameters
+    :param values: The argument values, in order: addresses and bytes as hex strings,
+                   integers as numbers or decimal/hex strings, tuples as lists
+    :return: The encoded arguments
+    """
+    if len(values) != len(constructor_types):
+        raise ValueError(f"The constructor takes {len(constructor_types)} arguments, {len(values)} given")
+    return encode(constructor_types, [_abi_value(abi_type, value) for abi_type, value in zip(constructor_types, values)])
 
 def compute_address(deployer: str, salt: int, creation_code: bytes) -> str:
     """
@@ -113,14 +436,10 @@ def compute_address(deployer: str, salt: int, creation_code: bytes) -> str:
     :param creation_code: The creation code of a hook contract
     :return: The computed address of the hook contract
     """
-    deployer_bytes = to_bytes(hexstr=deployer)
-    salt_bytes = Web3.to_bytes(salt)
-    creation_code_hash = keccak(creation_code)
-    
-    return Web3.to_checksum_address(Web3.solidity_keccak(
-        ['bytes1', 'address', 'bytes32', 'bytes32'],
-        ['0xff', deployer, Web3.to_hex(salt_bytes), Web3.to_hex(creation_code_hash)]
-    )[12:].hex())
+    preimage = build_preimage(to_bytes(hexstr=deployer), keccak(creation_code))
+    preimage[_SALT_OFFSET:_CODE_HASH_OFFSET] = salt.to_bytes(32, 'big')
+
+    return Web3.to_checksum_address(keccak(preimage)[12:])
 
 def hex_to_bytes(hex_str: str) -> bytes:
     """
@@ -0,0 +1,178 @@
+import re
+
+# Appended to generated hooks to bypass the check for hook flags at deploy time
+VALIDATE_HOOK_ADDRESS_STUB = """
+    function validateHookAddress(BaseHook _this) internal pure override {
+    }
+"""
+
+# Members of `Hooks.Permissions`, in declaration order
+PERMISSION_FIELDS = [
+    'beforeInitialize', 'afterInitialize',
+    'beforeAddLiquidity', 'afterAddLiquidity',
+    'beforeRemoveLiquidity', 'afterRemoveLiquidity',
+    'beforeSwap', 'afterSwap',
+    'beforeDonate', 'afterDonate',
+    'beforeSwapReturnDelta', 'afterSwapReturnDelta',
+    'afterAddLiquidityReturnDelta', 'afterRemoveLiquidityReturnDelta',
+]
+PERMISSIONS_TYPE = "struct Hooks.Permissions"
+
+FENCED_CODE_PATTERN = re.compile(r'```[ \t]*(?:solidity|sol)?[ \t]*\n(.*?)```', re.DOTALL | re.IGNORECASE)
+COMMENT_OR_STRING_PATTERN = re.compile(r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.DOTALL)
+CONTRACT_PATTERN = re.compile(r'\b(abstract\s+)?contract\s+(\w+)([^{]*)\{')
+
+
+def extract_code(answer):
+    """
+    Take the Solidity code out of an LLM answer: the first fenced code block if there is
+    one, otherwise everything from the SPDX line on, without stray backticks.
+    """
+    match = FENCED_CODE_PATTERN.search(answer)
+    if match:
+        code = match.group(1)
+    else:
+        index = answer.find("// SPDX-License-Identifier")
+        code = answer[index:] if index != -1 else answer
+    return code.replace("```", "").strip()
+
+
+def mask_comments_and_strings(code):
+    """
+    Blank out comments and string literals, keeping offsets and line breaks, so braces and
+    keywords inside them are not mistaken for code.
+    """
+    return COMMENT_OR_STRING_PATTERN.sub(lambda match: re.sub(r'[^\n]', " ", match.group(0)), code)
+
+
+def contract_spans(code):
+    """
+    Locate the contracts of a source.
+
+    :return: A list of (name, base list text, index of the opening brace, index of the closing brace, abstract)
+    """
+    masked = mask_comments_and_strings(code)
+    spans = []
+    for match in CONTRACT_PATTERN.finditer(masked):
+        depth = 0
+        for i in range(match.end() - 1, len(masked)):
+            if masked[i] == "{":
+                depth += 1
+            elif masked[i] == "}":
+                depth -= 1
+                if depth == 0:
+                    spans.append((match.group(2), match.group(3), match.end() - 1, i, bool(match.group(1))))
+                    break
+    return spans
+
+
+def prepare_source(answer):
+    """
+    Turn an LLM answer into the source to compile: extract the code and add the
+    `validateHookAddress` stub to the contract inheriting `BaseHook` (or the last contract).
+    """
+    code = extract_code(answer)
+    spans = [span for span in contract_spans(code) if not span[4]]
+    hooks = [span for span in spans if re.search(r'\bBaseHook\b', span[1])]
+    target = (hooks or spans or [None])[-1]
+    if target is None:
+        return code + VALIDATE_HOOK_ADDRESS_STUB
+    end = target[3]
+    return code[:end].rstrip() + "\n" + VALIDATE_HOOK_ADDRESS_STUB + code[end:]
+
+
+def walk(node):
+    """
+    Yield every AST node (dictionary with a `nodeType`) under `node`, depth first.
+    """
+    if isinstance(node, dict):
+        if "nodeType" in node:
+            yield node
+        for value in node.values():
+            yield from walk(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from walk(item)
+
+
+def _bool_literal(node):
+    if node.get("nodeType") == "Literal" and node.get("kind") == "bool":
+        return node.get("value") == "true"
+    return None
+
+
+def find_hook_contract(ast):
+    """
+    Pick the hook contract of a solc compact AST: the concrete contract that defines
+    `getHookPermissions`, or else the last concrete contract.
+    """
+    contracts = [node for node in ast.get("nodes", [])
+                 if node.get("nodeType") == "ContractDefinition"
+                 and node.get("contractKind") == "contract" and not node.get("abstract")]
+    for contract in reversed(contracts):
+        if any(node.get("nodeType") == "FunctionDefinition" and node.get("name") == "getHookPermissions"
+               for node in contract.get("nodes", [])):
+            return contract
+    return contracts[-1] if contracts else None
+
+
+def read_permissions(function):
+    """
+    Read the `Hooks.Permissions` returned by a `getHookPermissions` definition: a struct
+    constructor call with named or positional boolean literals, or boolean literals assigned
+    to the members of a local struct. Members that are not set to a literal are false.
+    """
+    permissions = dict.fromkeys(PERMISSION_FIELDS, False)
+    for node in walk(function.get("body")):
+        if node["nodeType"] == "FunctionCall" and node.get("kind") == "structConstructorCall" \
+                and PERMISSIONS_TYPE in node.get("typeDescriptions", {}).get("typeString", ""):
+            names = node.get("names") or PERMISSION_FIELDS
+            for name, argument in zip(names, node.get("arguments", [])):
+                value = _bool_literal(argument)
+                if name in permissions and value is not None:
+                    permissions[name] = value
+        elif node["nodeType"] == "Assignment" and node.get("operator") == "=":
+            target = node.get("leftHandSide", {})
+            value = _bool_literal(node.get("rightHandSide", {}))
+            if target.get("nodeType") == "MemberAccess" and value is not None \
+                    and PERMISSIONS_TYPE in target.get("expression", {}).get("typeDescriptions", {}).get("typeString", ""):
+                if target.get("memberName") in permissions:
+                    permissions[target["memberName"]] = value
+    return permissions
+
+
+def analyze_hook(ast, artifacts):
+    """
+    Extract what deployment needs from a compiled hook, in one pass over its AST.
+
+    :param ast: The solc compact AST of the generated source unit
+    :param artifacts: Contract name to its `abi` and `bytecode`, see `CompileServer.compile`
+    :return: A dictionary with `contract` (name), `constructor_types` (ABI types of the
+             constructor arguments) and `permissions` (`Hooks.Permissions` member to bool),
+             or None if the source has no concrete contract
+    """
+    contract = find_hook_contract(ast)
+    if contract is None:
+        return None
+    permissions = dict.fromkeys(PERMISSION_FIELDS, False)
+    for node in contract.get("nodes", []):
+        if node.get("nodeType") == "FunctionDefinition" and node.get("name") == "getHookPermissions":
+            permissions = read_permissions(node)
+
+    abi = artifacts.get(contract["name"], {}).get("abi", [])
+    constructor = next((item for item in abi if item.get("type") == "constructor"), {"inputs": []})
+    return {
+        'contract': contract["name"],
+        'constructor_types': [abi_type(item) for item in constructor["inputs"]],
+        'permissions': permissions,
+    }
+
+
+def abi_type(parameter):
+    """
+    Canonical ABI type of an ABI parameter, with tuples spelled out.
+    """
+    if parameter["type"].startswith("tuple"):
+        components = ",".join(abi_type(component) for component in parameter["components"])
+        return f"({components}){parameter['type'][len('tuple'):]}"
+    return parameter["type"]
@@ -0,0 +1,139 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from hook_address_miner import ALL_HOOK_MASK, MiningCancelled, find
+
+# Expected number of salts to hash before the 14 flag bits match. Salt trials are
+# independent, so this is also the expected remaining work at any point of the search
+EXPECTED_SALTS = ALL_HOOK_MASK + 1
+
+
+class MiningJobs:
+    """
+    Background CREATE2 salt mining jobs, tracked by ID so HTTP handlers can return right away.
+
+    Jobs run on a small thread pool on top of the shared mining process pool. A job that is
+    cancelled, or that nobody has polled for `idle_timeout` seconds, stops after its current batch.
+    """
+
+    def __init__(self, max_concurrent=2, max_jobs=256, idle_timeout=120, index=None):
+        """
+        :param max_concurrent: Number of jobs mined at the same time
+        :param max_jobs: Number of jobs kept in memory, the oldest finished ones are dropped first
+        :param idle_timeout: Seconds without a status poll after which a job is abandoned
+        :param index: Optional `SaltIndex` shared by all jobs
+        """
+        self.max_jobs = max_jobs
+        self.idle_timeout = idle_timeout
+        self.index = index
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="miner")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def submit(self, deployer, flags, creation_code, constructor_args, seed=0):
+        """
+        Queue a mining job.
+
+        :return: The job ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            'id': job_id,
+            'status': 'queued',
+            'flags': flags,
+            'salts_tried': 0,
+            'started': None,
+            'finished': None,
+            'last_polled': now,
+            'hook_address': None,
+            'salt': None,
+            'error': None,
+            'cancel': threading.Event(),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._prune()
+        self._executor.submit(self._run, job, deployer, flags, seed, creation_code, constructor_args)
+        return job_id
+
+    def status(self, job_id):
+        """
+        Report the state of a job and refresh its idle timer.
+
+        :return: A JSON-serialisable dictionary, or None for an unknown job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job['last_polled'] = time.time()
+            return self._describe(job)
+
+    def cancel(self, job_id):
+        """
+        Ask a job to stop after its current batch.
+
+        :return: The job state, or None for an unknown job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job['cancel'].set()
+            if job['status'] == 'queued':
+                job['status'] = 'cancelled'
+            return self._describe(job)
+
+    def _run(self, job, deployer, flags, seed, creation_code, constructor_args):
+        if job['cancel'].is_set():
+            return
+        job['status'] = 'running'
+        job['started'] = time.time()
+
+        def progress(salts_tried):
+            job['salts_tried'] = salts_tried
+
+        def should_stop():
+            idle = time.time() - job['last_polled'] > self.idle_timeout
+            return job['cancel'].is_set() or idle
+
+        try:
+            job['hook_address'], job['salt'] = find(deployer, flags, seed, creation_code, constructor_args,
+                                                    index=self.index, progress=progress,
+                                                    should_stop=should_stop)
+            job['status'] = 'done'
+        except MiningCancelled:
+            job['status'] = 'cancelled'
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+        finally:
+            job['finished'] = time.time()
+
+    def _describe(self, job):
+        elapsed = (job['finished'] or time.time()) - job['started'] if job['started'] else 0
+        hashes_per_sec = job['salts_tried'] / elapsed if elapsed > 0 else 0
+        expected_remaining = EXPECTED_SALTS if job['status'] in ('queued', 'running') else 0
+        return {
+            'id': job['id'],
+            'status': job['status'],
+            'flags': job['flags'],
+            'salts_tried': job['salts_tried'],
+            'hashes_per_sec': hashes_per_sec,
+            'expected_remaining_salts': expected_remaining,
+            'expected_remaining_seconds': expected_remaining / hashes_per_sec if hashes_per_sec else None,
+            'hook_address': job['hook_address'],
+            'salt': job['salt'],
+            'error': job['error'],
+        }
+
+    def _prune(self):
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[job_id]['status'] not in ('queued', 'running'):
+                del self._jobs[job_id]
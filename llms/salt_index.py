@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class SaltIndex:
+    """
+    Persistent table of mined CREATE2 salts keyed by deployer, init code hash and hook flags.
+
+    A mining pass from salt 0 meets most of the 2^14 flag combinations on its way to the
+    requested one. All of them are recorded with the lowest salt producing them, together
+    with the end of the contiguous range already scanned. A later request for other flags
+    is answered from the table, or resumes mining where the previous pass stopped.
+
+    Each (deployer, init code hash) entry is stored in its own file, so recording a pass
+    only rewrites that entry. At most `max_keys` entries are kept, the least recently used
+    one is evicted first.
+    """
+
+    def __init__(self, path, max_keys=1024):
+        """
+        :param path: Folder the index entries are loaded from and saved to
+        :param max_keys: Number of (deployer, init code hash) entries kept
+        """
+        self.path = path
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # Entries by key, least recently used first. Only keys are known until an entry is read
+        self._entries = OrderedDict()
+        os.makedirs(path, exist_ok=True)
+        files = [name for name in os.listdir(path) if name.endswith(".json")]
+        files.sort(key=lambda name: os.path.getmtime(os.path.join(path, name)))
+        for name in files:
+            self._entries[name[:-len(".json")]] = None
+
+    @staticmethod
+    def _key(deployer, init_code_hash):
+        return f"{deployer.lower()}_0x{init_code_hash.hex()}"
+
+    def lookup(self, deployer, init_code_hash, flags, seed=0):
+        """
+        Look up the lowest known salt at or above `seed` producing `flags`.
+
+        :param deployer: The address that will deploy the hook
+        :param init_code_hash: keccak256 of the creation code with its encoded constructor arguments
+        :param flags: The desired flags for the hook address
+        :param seed: The first acceptable salt
+        :return: A tuple (salt or None, salt to resume mining from)
+        """
+        with self._lock:
+            entry = self._get(self._key(deployer, init_code_hash))
+            if entry is None:
+                return None, seed
+            salt = entry['salts'].get(str(flags))
+            # Only salts inside the contiguous scanned range are known to be the lowest
+            if salt is not None and seed <= salt < entry['scanned_to']:
+                return salt, seed
+            # Nothing below the scanned frontier produces these flags
+            if salt is None and seed <= entry['scanned_to']:
+                return None, entry['scanned_to']
+            return None, seed
+
+    def record(self, deployer, init_code_hash, seed, result):
+        """
+        Merge the flag combinations met by a mining pass and persist its entry.
+
+        Passes starting above the scanned range leave a gap below them, so they are not
+        recorded: a salt they met may not be the lowest one producing its flags.
+
+        :param deployer: The address that will deploy the hook
+        :param init_code_hash: keccak256 of the creation code with its encoded constructor arguments
+        :param seed: The salt the pass started from
+        :param result: The dictionary returned by `hook_address_miner.mine`
+        """
+        key = self._key(deployer, init_code_hash)
+        with self._lock:
+            entry = self._get(key) or {'scanned_to': 0, 'salts': {}}
+            if seed > entry['scanned_to']:
+                return
+            salts = entry['salts']
+            for flags, salt in result['seen'].items():
+                known = salts.get(str(flags))
+                if known is None or salt < known:
+                    salts[str(flags)] = salt
+            entry['scanned_to'] = max(entry['scanned_to'], seed + result['salts_tried'])
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._save(key)
+            while len(self._entries) > self.max_keys:
+                evicted, _ = self._entries.popitem(last=False)
+                try:
+                    os.remove(self._file(evicted))
+                except FileNotFoundError:
+                    pass
+
+    def _get(self, key):
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        if self._entries[key] is None:
+            try:
+                with open(self._file(key), 'r') as file:
+                    self._entries[key] = json.load(file)
+            except (OSError, ValueError):
+                del self._entries[key]
+                return None
+        try:
+            # Keeps the eviction order across restarts
+            os.utime(self._file(key))
+        except OSError:
+            pass
+        return self._entries[key]
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.json")
+
+    def _save(self, key):
+        tmp_path = f"{self._file(key)}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(self._entries[key], file)
+        os.replace(tmp_path, self._file(key))
@@ -0,0 +1,100 @@
+import os
+
+import pytest
+from eth_abi import encode
+from eth_utils import keccak
+
+import hook_address_miner
+from hook_address_miner import compute_address, encode_constructor_args, find, find_many, mine
+from salt_index import SaltIndex
+
+DEPLOYER = "0x4e59b44847b379578588920cA78FbF26c0B4956C"
+CREATION_CODE = bytes.fromhex("6080604052348015600e575f80fd5b50")
+OTHER_CREATION_CODE = bytes.fromhex("6080604052348015600f575f80fd5b50")
+FLAGS = 0x0A0
+
+
+def test_compute_address_matches_eip_1014_vectors():
+    assert compute_address("0x0000000000000000000000000000000000000000", 0, bytes.fromhex("00")) \
+        == "0x4D1A2e2bB4F88F0250f26Ffff098B0b30B26BF38"
+    assert compute_address("0xdeadbeef00000000000000000000000000000000", 0, bytes.fromhex("00")) \
+        == "0xB928f69Bb1D91Cd65274e3c79d8986362984fDA3"
+    assert compute_address("0xdeadbeef00000000000000000000000000000000", 0xfeed << 144, bytes.fromhex("00")) \
+        == "0xD04116cDd17beBE565EB2422F2497E06cC1C9833"
+
+
+def test_find_returns_the_same_salt_whatever_the_number_of_workers():
+    address, salt = find(DEPLOYER, FLAGS, 0, CREATION_CODE, b"", workers=1)
+
+    assert find(DEPLOYER, FLAGS, 0, CREATION_CODE, b"", workers=4) == (address, salt)
+    assert int(address, 16) & hook_address_miner.ALL_HOOK_MASK == FLAGS
+    assert compute_address(DEPLOYER, int(salt, 16), CREATION_CODE) == address
+
+
+def test_find_many_agrees_with_find():
+    jobs = [
+        (DEPLOYER, FLAGS, 0, CREATION_CODE, b""),
+        (DEPLOYER, 0x1A0, 0, CREATION_CODE, b""),
+        (DEPLOYER, FLAGS, 0, OTHER_CREATION_CODE, b""),
+        (DEPLOYER, FLAGS, 0, CREATION_CODE, b""),
+    ]
+
+    results = {position: (address, salt) for position, address, salt in find_many(jobs, workers=2)}
+
+    assert results == {position: find(*job, workers=1) for position, job in enumerate(jobs)}
+
+
+def test_salt_index_answers_flags_met_by_an_earlier_pass(tmp_path, monkeypatch):
+    index = SaltIndex(str(tmp_path))
+    find(DEPLOYER, FLAGS, 0, CREATION_CODE, b"", workers=1, index=index)
+    seen = mine(DEPLOYER, FLAGS, 0, keccak(CREATION_CODE), workers=1)['seen']
+    other_flags = next(flags for flags in seen if flags != FLAGS)
+
+    def no_mining(*args, **kwargs):
+        raise AssertionError("mined again")
+
+    monkeypatch.setattr(hook_address_miner, "mine", no_mining)
+    address, salt = find(DEPLOYER, other_flags, 0, CREATION_CODE, b"", index=index)
+
+    assert int(salt, 16) == seen[other_flags]
+    assert address == compute_address(DEPLOYER, seen[other_flags], CREATION_CODE)
+    # Reloaded from disk
+    assert SaltIndex(str(tmp_path)).lookup(DEPLOYER, keccak(CREATION_CODE), other_flags) == (seen[other_flags], 0)
+
+
+def test_salt_index_only_trusts_the_contiguous_scanned_range(tmp_path):
+    index = SaltIndex(str(tmp_path))
+    init_code_hash = keccak(CREATION_CODE)
+    index.record(DEPLOYER, init_code_hash, 0, {'seen': {1: 5, 2: 40}, 'salts_tried': 50})
+    # Started above the scanned range, so not recorded
+    index.record(DEPLOYER, init_code_hash, 100, {'seen': {3: 120}, 'salts_tried': 50})
+
+    assert index.lookup(DEPLOYER, init_code_hash, 1) == (5, 0)
+    assert index.lookup(DEPLOYER, init_code_hash, 1, seed=10) == (None, 10)
+    assert index.lookup(DEPLOYER, init_code_hash, 3) == (None, 50)
+    assert index.lookup(DEPLOYER, init_code_hash, 3, seed=100) == (None, 100)
+
+
+def test_salt_index_evicts_the_least_recently_used_key(tmp_path):
+    index = SaltIndex(str(tmp_path), max_keys=2)
+    hashes = [keccak(bytes([i])) for i in range(3)]
+    index.record(DEPLOYER, hashes[0], 0, {'seen': {1: 0}, 'salts_tried': 1})
+    index.record(DEPLOYER, hashes[1], 0, {'seen': {1: 0}, 'salts_tried': 1})
+    index.lookup(DEPLOYER, hashes[0], 1)
+    index.record(DEPLOYER, hashes[2], 0, {'seen': {1: 0}, 'salts_tried': 1})
+
+    assert index.lookup(DEPLOYER, hashes[1], 1) == (None, 0)
+    assert index.lookup(DEPLOYER, hashes[0], 1) == (0, 0)
+    assert index.lookup(DEPLOYER, hashes[2], 1) == (0, 0)
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_encode_constructor_args_for_address_and_uint():
+    manager = "0x" + "ab" * 20
+    expected = encode(["address", "uint256"], [manager, 300])
+
+    assert encode_constructor_args(["address", "uint256"], [manager, 300]) == expected
+    assert encode_constructor_args(["address", "uint256"], [manager.upper().replace("0X", "0x"), "0x12c"]) == expected
+    assert encode_constructor_args(["address", "uint256"], [manager, "300"]) == expected
+    with pytest.raises(ValueError):
+        encode_constructor_args(["address", "uint256"], [manager])
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+import verification_jobs
+from verification_jobs import FAILED, RETRY, VERIFIED, VerificationJobs
+
+BUILD = {"build_id": "build-1", "contract": "Hook", "file_name": "generated_hook_0.sol", "source": ""}
+ADDRESS = "0x" + "ab" * 20
+
+
+class FakeVerifier:
+    """
+    Returns the scripted outcomes in order, repeating the last one. An exception in the
+    script is raised instead of returned.
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def verify(self, build, contract_address, constructor_args):
+        self.calls.append((build["build_id"], contract_address, constructor_args))
+        self.release.wait(5)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome, f"{outcome} #{len(self.calls)}"
+
+
+def wait_for(jobs, job_id, *statuses, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = jobs.status(job_id)
+        if status["status"] in statuses:
+            return status
+        time.sleep(0.005)
+    raise AssertionError(f"Job {job_id} is still {jobs.status(job_id)['status']}")
+
+
+@pytest.fixture
+def waits(monkeypatch):
+    """
+    Upper bounds handed to the backoff, retrying right away.
+    """
+    caps = []
+
+    def full_jitter(value):
+        caps.append(value)
+        return 0
+
+    monkeypatch.setattr(verification_jobs.backoff, "full_jitter", full_jitter)
+    return caps
+
+
+def test_retries_with_exponential_backoff_until_verified(waits):
+    verifier = FakeVerifier(RETRY, RETRY, VERIFIED)
+    jobs = VerificationJobs(verifier, max_tries=5, max_retry_wait=3)
+
+    job_id = jobs.submit(BUILD, ADDRESS, "0x01")
+    status = wait_for(jobs, job_id, "verified", "failed")
+
+    assert status["status"] == "verified"
+    assert status["tries"] == 3
+    assert status["output"] == "verified #3"
+    assert status["next_try_in"] is None
+    # 2 ** tries, capped by max_retry_wait
+    assert waits == [2, 3]
+    assert verifier.calls == [("build-1", ADDRESS, "0x01")] * 3
+
+
+def test_verifier_errors_are_retried(waits):
+    verifier = FakeVerifier(ConnectionError("connection reset"), VERIFIED)
+    jobs = VerificationJobs(verifier)
+
+    status = wait_for(jobs, jobs.submit(BUILD, ADDRESS, None), "verified", "failed")
+
+    assert status["status"] == "verified"
+    assert status["tries"] == 2
+
+
+def test_fails_after_max_tries(waits):
+    verifier = FakeVerifier(RETRY)
+    jobs = VerificationJobs(verifier, max_tries=3)
+
+    status = wait_for(jobs, jobs.submit(BUILD, ADDRESS, None), "verified", "failed")
+
+    assert status["status"] == "failed"
+    assert status["tries"] == 3
+    assert status["output"] == "retry #3"
+    assert len(waits) == 2
+
+
+def test_rejected_verification_is_not_retried(waits):
+    verifier = FakeVerifier(FAILED)
+    jobs = VerificationJobs(verifier)
+
+    status = wait_for(jobs, jobs.submit(BUILD, ADDRESS, None), "verified", "failed")
+
+    assert status["status"] == "failed"
+    assert status["tries"] == 1
+    assert waits == []
+
+
+def test_status_follows_the_job(monkeypatch):
+    monkeypatch.setattr(verification_jobs.backoff, "full_jitter", lambda value: 0.2)
+    verifier = FakeVerifier(RETRY, VERIFIED)
+    verifier.release.clear()
+    jobs = VerificationJobs(verifier)
+
+    job_id = jobs.submit(BUILD, ADDRESS, None)
+    status = wait_for(jobs, job_id, "running")
+    assert status["tries"] == 1
+    assert status["build_id"] == "build-1"
+    assert status["contract_address"] == ADDRESS
+
+    verifier.release.set()
+    status = wait_for(jobs, job_id, "retrying")
+    assert 0 < status["next_try_in"] <= 0.2
+    assert status["output"] == "retry #1"
+
+    assert wait_for(jobs, job_id, "verified")["tries"] == 2
+    assert jobs.status("unknown") is None
+
+
+def test_same_address_shares_a_job_until_it_fails(waits):
+    verifier = FakeVerifier(FAILED)
+    verifier.release.clear()
+    jobs = VerificationJobs(verifier)
+
+    job_id = jobs.submit(BUILD, ADDRESS, None)
+    assert jobs.submit(BUILD, ADDRESS.upper().replace("0X", "0x"), None) == job_id
+
+    verifier.release.set()
+    wait_for(jobs, job_id, "failed")
+    assert jobs.submit(BUILD, ADDRESS, None) != job_id
@@ -0,0 +1,175 @@
+import re
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import backoff
+
+from functions import save_to_sol
+
+VERIFIED = "verified"
+RETRY = "retry"
+FAILED = "failed"
+
+VERIFIED_PATTERN = re.compile(r'successfully verified|already verified|Pass - Verified', re.IGNORECASE)
+# Rate limits and transient verifier or network errors, worth another try later
+RETRYABLE_PATTERN = re.compile(r'rate limit|too many requests|\b429\b|\b50[234]\b|timed out|timeout|connection', re.IGNORECASE)
+
+
+class ForgeVerifier:
+    """
+    Verifies hooks with `forge verify-contract`, in a private workspace holding the build's source.
+
+    The verifier API is only reached through `verifier_url`, so a local stand-in of the
+    Blockscout API can replace it. Any object with the same `verify` method can be given
+    to `VerificationJobs` instead.
+    """
+
+    def __init__(self, build_workspaces, verifier_url="https://eth-sepolia.blockscout.com/api",
+                 chain="sepolia", verifier="blockscout", timeout=300):
+        """
+        :param build_workspaces: `BuildWorkspaces` the verifications run in
+        :param verifier_url: Base URL of the verifier API
+        :param chain: Chain name or ID passed to forge
+        :param verifier: Verifier kind passed to forge
+        :param timeout: Seconds after which a verification is killed
+        """
+        self.build_workspaces = build_workspaces
+        self.verifier_url = verifier_url
+        self.chain = chain
+        self.verifier = verifier
+        self.timeout = timeout
+
+    def verify(self, build, contract_address, constructor_args):
+        """
+        :param build: The `ArtifactStore` record of the deployed hook
+        :param contract_address: Address of the deployed hook
+        :param constructor_args: ABI-encoded constructor arguments as a hex string, or None
+        :return: (VERIFIED, RETRY or FAILED, verifier output)
+        """
+        command = ["forge", "verify-contract", contract_address, f"src/generated/{build['file_name']}:{build['contract']}",
+                   "--verifier", self.verifier, "--chain", self.chain, "--verifier-url", self.verifier_url, "--watch"]
+        if constructor_args and constructor_args != "0x":
+            command += ["--constructor-args", constructor_args]
+        with self.build_workspaces.workspace() as workspace:
+            save_to_sol(build['source'], workspace.generated_dir, build['file_name'])
+            try:
+                result = subprocess.run(command, capture_output=True, text=True, cwd=workspace.path, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                return RETRY, f"forge verify-contract timed out after {self.timeout}s"
+        output = (result.stdout + "\n" + result.stderr).strip()
+        if VERIFIED_PATTERN.search(output):
+            return VERIFIED, output
+        if RETRYABLE_PATTERN.search(output):
+            return RETRY, output
+        return (VERIFIED if result.returncode == 0 else FAILED), output
+
+
+class VerificationJobs:
+    """
+    Background contract verification jobs, tracked by ID so /verify can return right away.
+
+    Jobs run on a small thread pool. A verification hitting a rate limit or a transient
+    error is retried after a jittered exponential backoff, without holding a worker while
+    it waits. Submitting an address that is already queued, running or verified returns
+    the existing job.
+    """
+
+    def __init__(self, verifier, max_concurrent=2, max_jobs=256, max_tries=5, max_retry_wait=120):
+        """
+        :param verifier: Object with a `verify(build, contract_address, constructor_args)` method, see `ForgeVerifier`
+        :param max_concurrent: Number of verifications running at the same time
+        :param max_jobs: Number of jobs kept in memory, the oldest finished ones are dropped first
+        :param max_tries: Tries of a verification before it fails
+        :param max_retry_wait: Upper bound in seconds of the wait between two tries
+        """
+        self.verifier = verifier
+        self.max_jobs = max_jobs
+        self.max_tries = max_tries
+        self.max_retry_wait = max_retry_wait
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="verifier")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._by_address = {}
+
+    def submit(self, build, contract_address, constructor_args):
+        """
+        Queue the verification of a deployed hook.
+
+        :return: The job ID, of an existing job if the address is already being verified or verified
+        """
+        address = contract_address.lower()
+        with self._lock:
+            existing = self._jobs.get(self._by_address.get(address))
+            if existing is not None and existing['status'] != 'failed':
+                return existing['id']
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'build_id': build['build_id'],
+                'contract_address': contract_address,
+                'tries': 0,
+                'next_try': None,
+                'submitted': time.time(),
+                'finished': None,
+                'output': None,
+                'build': build,
+                'constructor_args': constructor_args,
+            }
+            self._by_address[address] = job_id
+            self._prune()
+        self._executor.submit(self._run, self._jobs[job_id])
+        return job_id
+
+    def status(self, job_id):
+        """
+        :return: A JSON-serialisable dictionary, or None for an unknown job
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._describe(job) if job is not None else None
+
+    def _run(self, job):
+        job['status'] = 'running'
+        job['next_try'] = None
+        job['tries'] += 1
+        try:
+            outcome, job['output'] = self.verifier.verify(job['build'], job['contract_address'], job['constructor_args'])
+        except Exception as e:
+            outcome, job['output'] = RETRY, str(e)
+
+        if outcome == RETRY and job['tries'] < self.max_tries:
+            wait = backoff.full_jitter(min(self.max_retry_wait, 2 ** job['tries']))
+            job['status'] = 'retrying'
+            job['next_try'] = time.time() + wait
+            timer = threading.Timer(wait, self._executor.submit, args=(self._run, job))
+            timer.daemon = True
+            timer.start()
+            return
+        job['status'] = 'verified' if outcome == VERIFIED else 'failed'
+        job['finished'] = time.time()
+
+    def _describe(self, job):
+        return {
+            'id': job['id'],
+            'status': job['status'],
+            'build_id': job['build_id'],
+            'contract_address': job['contract_address'],
+            'tries': job['tries'],
+            'next_try_in': max(0, job['next_try'] - time.time()) if job['next_try'] else None,
+            'output': job['output'],
+        }
+
+    def _prune(self):
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            job = self._jobs[job_id]
+            if job['status'] in ('verified', 'failed'):
+                del self._jobs[job_id]
+                if self._by_address.get(job['contract_address'].lower()) == job_id:
+                    del self._by_address[job['contract_address'].lower()]